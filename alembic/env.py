@@ -1,5 +1,6 @@
 from logging.config import fileConfig
 import sys
+from app.core.config import settings
 from app.db.models import Base
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
@@ -16,6 +17,9 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Migrate the same database the app uses (DATABASE_URL), not just the default in alembic.ini
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
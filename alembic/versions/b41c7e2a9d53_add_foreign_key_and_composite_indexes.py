@@ -0,0 +1,34 @@
+"""Add foreign key and composite indexes
+
+Revision ID: b41c7e2a9d53
+Revises: 9f752c7604d8
+Create Date: 2026-10-19 10:12:41.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41c7e2a9d53'
+down_revision: Union[str, Sequence[str], None] = '9f752c7604d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_farms_owner_id'), 'farms', ['owner_id'], unique=False)
+    op.create_index('ix_recommendations_farm_id_created_at', 'recommendations', ['farm_id', 'created_at'], unique=False)
+    # The composite index's leading column makes the single-column crop_name index redundant
+    op.create_index('ix_market_data_crop_name_market_name', 'market_data', ['crop_name', 'market_name'], unique=False)
+    op.drop_index(op.f('ix_market_data_crop_name'), table_name='market_data')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_market_data_crop_name'), 'market_data', ['crop_name'], unique=False)
+    op.drop_index('ix_market_data_crop_name_market_name', table_name='market_data')
+    op.drop_index('ix_recommendations_farm_id_created_at', table_name='recommendations')
+    op.drop_index(op.f('ix_farms_owner_id'), table_name='farms')
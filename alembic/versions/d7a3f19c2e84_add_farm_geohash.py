@@ -0,0 +1,79 @@
+"""Add farm geohash
+
+Revision ID: d7a3f19c2e84
+Revises: b41c7e2a9d53
+Create Date: 2026-10-19 14:03:22.187405
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3f19c2e84'
+down_revision: Union[str, Sequence[str], None] = 'b41c7e2a9d53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+GEOHASH_PRECISION = 9
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def _encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    # A frozen copy of app.services.geo.encode_geohash as of this revision, so later changes
+    # to the app can't change what this migration writes
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        if coordinate >= middle:
+            value = value << 1 | 1
+            interval[0] = middle
+        else:
+            value <<= 1
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('farms', sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    # Backfill in primary key order, a batch at a time, so large tables aren't read into memory at once
+    farms = sa.table('farms', sa.column('id', sa.Integer), sa.column('latitude', sa.Float),
+                     sa.column('longitude', sa.Float), sa.column('geohash', sa.String))
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(farms.c.id, farms.c.latitude, farms.c.longitude)
+            .where(farms.c.id > last_id, farms.c.latitude.is_not(None), farms.c.longitude.is_not(None))
+            .order_by(farms.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            farms.update().where(farms.c.id == sa.bindparam('farm_id')).values(geohash=sa.bindparam('cell')),
+            [{'farm_id': farm_id, 'cell': _encode_geohash(latitude, longitude)} for farm_id, latitude, longitude in rows],
+        )
+        last_id = rows[-1][0]
+
+    # Created after the backfill so the updates don't have to maintain it
+    op.create_index(op.f('ix_farms_geohash'), 'farms', ['geohash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_farms_geohash'), table_name='farms')
+    with op.batch_alter_table('farms') as batch_op:
+        batch_op.drop_column('geohash')
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.db import schemas
+from app.core.profiling import ProfilerBusy, collapse, profiler, slow_requests
+from app.core.security import get_current_admin
+
+MAX_PROFILE_SECONDS = 60
+
+# Profiles and slow-request records are per worker process: each call sees the worker that served it
+router = APIRouter(prefix="/api/admin", tags=["Admin"], dependencies=[Depends(get_current_admin)])
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def run_profile(
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+):
+    """
+    Samples every thread's stack for `seconds` and returns them in the collapsed
+    format ("frame;frame;frame count"), ready for flamegraph.pl or speedscope.
+    The event loop keeps serving requests while the sampler runs in its own thread.
+    """
+    try:
+        stacks = await run_in_threadpool(profiler.profile, seconds, interval_ms / 1000)
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return collapse(stacks)
+
+
+@router.get("/slow-requests", response_model=schemas.SlowRequestLog)
+def read_slow_requests(limit: int = Query(50, ge=1, le=1000)):
+    """
+    The most recent requests over the threshold, newest first, with time per stage
+    (db, bcrypt, inference, upstream.*, cache.shared, queue.*).
+    """
+    records = list(slow_requests.records)[::-1][:limit]
+    return schemas.SlowRequestLog(
+        threshold_ms=slow_requests.threshold_ms, capacity=slow_requests.records.maxlen, requests=records
+    )
+
+
+@router.put("/slow-requests", response_model=schemas.SlowRequestLog)
+def configure_slow_requests(config: schemas.SlowRequestConfig):
+    """
+    Turns recording on (threshold_ms > 0) or off (threshold_ms = null) and resizes the buffer.
+    """
+    slow_requests.configure(config.threshold_ms, config.capacity)
+    return schemas.SlowRequestLog(
+        threshold_ms=slow_requests.threshold_ms, capacity=slow_requests.records.maxlen, requests=[]
+    )
+
+
+@router.delete("/slow-requests", status_code=204)
+def clear_slow_requests():
+    slow_requests.records.clear()
@@ -4,6 +4,7 @@ from datetime import timedelta
 from typing import Annotated
 from fastapi.security import OAuth2PasswordRequestForm
 from app.core.config import settings
+from app.core.rate_limit import ip_rate_limit
 from app.core.security import create_access_token, get_password_hash, verify_password
 from app.db import models, schemas
 from app.db.database import get_db
@@ -11,7 +12,10 @@ from app.db.database import get_db
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
-@router.post("/register", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/register", response_model=schemas.User, status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(ip_rate_limit("register"))],
+)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
     db_user = db.query(models.User).filter(models.User.email == user.email).first()
@@ -31,7 +35,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
     return new_user
 
-@router.post("/login", response_model=schemas.Token)
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(ip_rate_limit("login"))])
 def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: Session = Depends(get_db),
@@ -61,7 +65,7 @@ def login_for_access_token(
 
 # ... keep the existing router and create_user function ...
 
-@router.post("/login", response_model=schemas.Token)
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(ip_rate_limit("login"))])
 def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: Session = Depends(get_db),
@@ -1,15 +1,97 @@
+import json
+import re
+import time
+from typing import Literal
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 import httpx
 
 from app.db import models, schemas
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.profiling import stage
+from app.core.rate_limit import rate_limit
 from app.core.security import get_current_user
+from app.services.resilience import CircuitBreaker, CircuitOpenError, ConcurrencyLimiter, LimitExceeded
 
 router = APIRouter(prefix="/api/chatbot", tags=["Chatbot"])
 
-# This would be the URL of your external RAG/Gemini service
-GEMINI_SERVICE_URL = "https://your.external.ai.service/api/ask"
+# LLM answers routinely take several seconds, so only much slower calls count as degraded
+chatbot_breaker = CircuitBreaker("chatbot", slow_call_duration=20.0)
+
+chatbot_limiter = ConcurrencyLimiter(
+    "chatbot",
+    max_concurrent=settings.CHATBOT_MAX_CONCURRENCY,
+    max_per_key=settings.CHATBOT_MAX_PER_USER,
+)
+
+# Answers keyed by normalized question, language and region. Entries younger than
+# CHATBOT_ANSWER_TTL_SECONDS are served directly; older ones are only kept as a
+# fallback while the AI service is failing or its circuit is open.
+_answers = TTLCache(maxsize=5_000, ttl=24 * 3600)
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _answer_key(query: schemas.ChatbotQuery):
+    """
+    Farmers ask the same things with different casing and punctuation
+    ("When to sow onion in Nashik?"), so those are folded before lookup.
+    """
+    question = _WHITESPACE.sub(" ", _NON_WORD.sub(" ", query.question.casefold())).strip()
+    region = (query.region or "").casefold().strip()
+    return (query.language_code, region, question)
+
+
+def _placeholder_answer(query: schemas.ChatbotQuery) -> str:
+    # For demonstration, we'll echo a formatted response until an AI service is configured.
+    region = query.region or "Nashik"
+    return f"As an AI, I've processed your question about '{query.question}' for the {region} region. Here is your detailed guidance..."
+
+
+def _fresh_answer(key) -> str | None:
+    entry = _answers.get_entry(key)
+    if entry and entry[1] < settings.CHATBOT_ANSWER_TTL_SECONDS:
+        return entry[0]
+    return None
+
+
+async def _acquire_slot(user: models.User):
+    try:
+        await chatbot_limiter.acquire(user.id)
+    except LimitExceeded as exc:
+        status_code = 429 if exc.scope == "per_key" else 503
+        raise HTTPException(
+            status_code=status_code, detail=str(exc), headers={"Retry-After": str(exc.retry_after)}
+        )
+
+
+async def _ask_upstream(query: schemas.ChatbotQuery) -> str | None:
+    async with httpx.AsyncClient() as client:
+        response = await client.post(settings.CHATBOT_SERVICE_URL, json=query.dict(), timeout=30.0)
+        response.raise_for_status()
+        return response.json().get("answer")
+
+
+async def _stream_upstream(query: schemas.ChatbotQuery):
+    """
+    Relays tokens from the AI service, which streams NDJSON lines of the form {"token": "..."}.
+    """
+    async with httpx.AsyncClient() as client:
+        async with client.stream(
+            "POST", settings.CHATBOT_SERVICE_URL, json={**query.dict(), "stream": True}, timeout=30.0
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    token = json.loads(line).get("token")
+                    if token:
+                        yield token
+
 
-@router.post("/ask", response_model=schemas.ChatbotResponse)
+@router.post("/ask", response_model=schemas.ChatbotResponse, dependencies=[Depends(rate_limit("chatbot", cost=5))])
 async def ask_chatbot(
     query: schemas.ChatbotQuery,
     current_user: models.User = Depends(get_current_user),
@@ -19,22 +101,129 @@ async def ask_chatbot(
     """
     print(f"User {current_user.email} is asking: '{query.question}'")
 
+    if not settings.CHATBOT_SERVICE_URL:
+        return schemas.ChatbotResponse(answer=_placeholder_answer(query))
+
+    cache_key = _answer_key(query)
+    cached_answer = _fresh_answer(cache_key)
+    if cached_answer:
+        return schemas.ChatbotResponse(answer=cached_answer)
+
+    with stage("queue.chatbot"):
+        await _acquire_slot(current_user)
     try:
-        # --- Placeholder Logic ---
-        # In a real scenario, you'd make a call to your AI service.
-        # async with httpx.AsyncClient() as client:
-        #     response = await client.post(GEMINI_SERVICE_URL, json=query.dict())
-        #     response.raise_for_status()
-        #     answer = response.json().get("answer")
+        with stage("upstream.chatbot"):
+            answer = await chatbot_breaker.call(_ask_upstream, query)
+    except (CircuitOpenError, httpx.HTTPError, ValueError) as exc:
+        stale_answer = _answers.get(cache_key)
+        if stale_answer:
+            return schemas.ChatbotResponse(answer=stale_answer)
+        raise HTTPException(status_code=503, detail=f"AI service is unavailable: {exc}")
+    finally:
+        chatbot_limiter.release(current_user.id)
+
+    if not answer:
+        raise HTTPException(status_code=500, detail="Failed to get a response from the AI service.")
+
+    _answers.set(cache_key, answer)
+    return schemas.ChatbotResponse(answer=answer)
+
+
+@router.post("/ask/stream", dependencies=[Depends(rate_limit("chatbot", cost=5))])
+async def ask_chatbot_stream(
+    query: schemas.ChatbotQuery,
+    format: Literal["ndjson", "sse"] = "ndjson",
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Streams the answer as it is generated, either as NDJSON lines or as Server-Sent Events.
+    Each message is {"token": "..."}; the last one is {"done": true, "cached": bool},
+    or {"error": "..."} if the AI service fails mid-answer.
+    """
+    print(f"User {current_user.email} is asking (streaming): '{query.question}'")
+
+    def encode(message: dict) -> str:
+        payload = json.dumps(message)
+        return f"data: {payload}\n\n" if format == "sse" else payload + "\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+
+    def replay(answer: str, cached: bool):
+        # Known answers are sent word by word so clients handle one code path
+        for token in re.findall(r"\S+\s*", answer):
+            yield encode({"token": token})
+        yield encode({"done": True, "cached": cached})
+
+    if not settings.CHATBOT_SERVICE_URL:
+        return StreamingResponse(replay(_placeholder_answer(query), cached=False), media_type=media_type)
+
+    cache_key = _answer_key(query)
+    cached_answer = _fresh_answer(cache_key)
+    if cached_answer:
+        return StreamingResponse(replay(cached_answer, cached=True), media_type=media_type)
+
+    await _acquire_slot(current_user)
+    if not chatbot_breaker.allow_request():
+        chatbot_limiter.release(current_user.id)
+        stale_answer = _answers.get(cache_key)
+        if stale_answer:
+            return StreamingResponse(replay(stale_answer, cached=True), media_type=media_type)
+        raise HTTPException(status_code=503, detail="AI service is unavailable: circuit is open")
+
+    start = time.perf_counter()
+    first_token_at = None
+    settled = False
+
+    def settle(failed: bool = False):
+        # Time to first token is what users wait on, so that is what the breaker judges
+        nonlocal settled
+        if settled:
+            return
+        settled = True
+        if failed:
+            chatbot_breaker.record_failure()
+        else:
+            chatbot_breaker.record_success(first_token_at if first_token_at is not None else time.perf_counter() - start)
+
+    def close():
+        # Runs however the response ends, including a client that disconnects before the first token
+        settle()
+        chatbot_limiter.release(current_user.id)
+
+    async def relay():
+        nonlocal first_token_at
+        tokens = []
+        try:
+            async for token in _stream_upstream(query):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter() - start
+                tokens.append(token)
+                yield encode({"token": token})
+        except (httpx.HTTPError, ValueError) as exc:
+            settle(failed=True)
+            stale_answer = _answers.get(cache_key)
+            if not tokens and stale_answer:
+                for message in replay(stale_answer, cached=True):
+                    yield message
+            else:
+                yield encode({"error": f"AI service is unavailable: {exc}"})
+            return
+
+        settle()
+        if tokens:
+            _answers.set(cache_key, "".join(tokens))
+        yield encode({"done": True, "cached": False})
 
-        # For demonstration, we'll echo a formatted response.
-        answer = f"As an AI, I've processed your question about '{query.question}' for the Nashik region. Here is your detailed guidance..."
-        # --- End Placeholder ---
+    return _ClosingStreamingResponse(relay(), on_close=close, media_type=media_type)
 
-        if not answer:
-            raise HTTPException(status_code=500, detail="Failed to get a response from the AI service.")
 
-        return schemas.ChatbotResponse(answer=answer)
+class _ClosingStreamingResponse(StreamingResponse):
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self._on_close = on_close
 
-    except httpx.RequestError as exc:
-        raise HTTPException(status_code=503, detail=f"AI service is unavailable: {exc}")
\ No newline at end of file
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._on_close()
@@ -1,14 +1,24 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from typing import List, Literal
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Request, Response, UploadFile, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.db import schemas, models
 from app.db.database import get_db
+from app.core.http_cache import REVALIDATE, make_etag, not_modified
+from app.core.rate_limit import rate_limit
 from app.core.security import get_current_user
 from app.services.data_ingestion import fetch_soil_data
+from app.services.farm_import import (
+    enrich_soil_data, farms_missing_soil, import_farms, iter_csv_rows, iter_geojson_rows,
+)
 router = APIRouter(prefix="/api/farms", tags=["Farms"])
 
-@router.post("/", response_model=schemas.Farm, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/", response_model=schemas.Farm, status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit("create_farm", cost=5))],
+)
 async def create_farm_for_user( # Make the function async
     farm: schemas.FarmCreate,
     db: Session = Depends(get_db),
@@ -33,9 +43,82 @@ async def create_farm_for_user( # Make the function async
     return new_farm
 
 
-@router.get("/", response_model=List[schemas.Farm])
+@router.get("/", response_model=List[schemas.Farm], dependencies=[Depends(rate_limit("list_farms"))])
 def read_user_farms(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    return current_user.farms
\ No newline at end of file
+    # Farms and soil data are only ever inserted, so counts and highest ids version the list
+    versions = db.query(
+        func.count(models.Farm.id), func.max(models.Farm.id), func.count(models.SoilData.id), func.max(models.SoilData.id)
+    ).outerjoin(models.SoilData, models.SoilData.farm_id == models.Farm.id).filter(
+        models.Farm.owner_id == current_user.id
+    ).one()
+    cached = not_modified(request, response, make_etag("farms", current_user.id, *versions), REVALIDATE)
+    if cached:
+        return cached
+    return current_user.farms
+
+
+@router.post(
+    "/bulk", response_model=schemas.FarmImportReport, dependencies=[Depends(rate_limit("bulk_import", cost=30))]
+)
+def bulk_import_farms(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    format: Literal["csv", "geojson"] | None = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Registers many farms from a CSV (name, latitude, longitude columns) or a GeoJSON
+    FeatureCollection of Points with a "name" property. The upload is read row by row,
+    valid rows are saved in chunks, and soil data is fetched in the background once
+    per distinct location.
+    """
+    if format is None:
+        extension = os.path.splitext(file.filename or "")[1].lower()
+        if extension == ".csv" or file.content_type == "text/csv":
+            format = "csv"
+        elif extension in (".geojson", ".json") or file.content_type in ("application/geo+json", "application/json"):
+            format = "geojson"
+        else:
+            raise HTTPException(status_code=400, detail="Could not detect the file format. Pass format=csv or format=geojson.")
+
+    rows = iter_csv_rows(file.file) if format == "csv" else iter_geojson_rows(file.file)
+    report, locations = import_farms(db, rows, owner_id=current_user.id)
+
+    if locations:
+        background_tasks.add_task(enrich_soil_data, locations)
+
+    created = sum(1 for entry in report if entry.status == "created")
+    return schemas.FarmImportReport(
+        created=created,
+        failed=len(report) - created,
+        soil_lookups_queued=len(locations),
+        rows=report,
+    )
+
+
+@router.post(
+    "/soil/retry", response_model=schemas.SoilRetryReport,
+    dependencies=[Depends(rate_limit("soil_retry", cost=30))],
+)
+def retry_soil_lookups(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Queues SoilGrids lookups again, in the background, for the user's farms that still
+    have no soil data (e.g. because SoilGrids was down during a bulk import).
+    """
+    locations = farms_missing_soil(db, current_user.id)
+    if locations:
+        background_tasks.add_task(enrich_soil_data, locations)
+    return schemas.SoilRetryReport(
+        farms_missing_soil=sum(len(farm_ids) for farm_ids in locations.values()),
+        soil_lookups_queued=len(locations),
+    )
@@ -1,25 +1,50 @@
-from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Any, Literal
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 import json
+import numpy as np
 
 from app.db import models, schemas
 from app.db.database import get_db
+from app.core.cache import TieredCache
+from app.core.config import settings
+from app.core.http_cache import REVALIDATE, SHORT_LIVED, make_etag, not_modified
+from app.core.profiling import stage
+from app.core.rate_limit import rate_limit
 from app.core.security import get_current_user
-from app.services.data_ingestion import fetch_weather_forecast
+from app.services.data_ingestion import get_weather_features
 
 
-from app.services.ml_service import prediction_service
+from app.services.ml_service import SCENARIO_COLUMNS, expand_scenarios, prediction_service
+from app.services.resilience import ConcurrencyLimiter, LimitExceeded
+
+MAX_SCENARIOS = 10_000
+
+# Model runs happen in the threadpool so they don't stall the event loop; this bounds how many
+# run at once and how many may queue, shedding the rest with a 503 instead of queueing without limit
+inference_limiter = ConcurrencyLimiter(
+    "inference",
+    max_concurrent=settings.INFERENCE_MAX_CONCURRENCY,
+    max_wait=2.0,
+    max_queue=settings.INFERENCE_MAX_QUEUE,
+)
+
+# Ranked recommendations depend only on the model inputs and the models themselves,
+# so farms sharing soil pH and a weather cell share an entry, and new models start a fresh namespace.
+_recommendation_cache = TieredCache(
+    "recommendations", version=prediction_service.version, ttl=24 * 3600, local_maxsize=20_000
+)
 
 router = APIRouter(prefix="/api/recommendations", tags=["Recommendations"])
 
 
-@router.get("/{farm_id}")
-async def generate_recommendation(
-    farm_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-) -> Any:
+async def _get_live_features(farm_id: int, weather_source: str, db: Session, current_user: models.User):
+    """
+    Loads a farm the user owns and assembles the model's 'live_features' for it.
+    Returns the features and where the weather part came from ("live" or "climatology").
+    """
     farm = db.query(models.Farm).filter(models.Farm.id == farm_id).first()
     if not farm:
         raise HTTPException(status_code=404, detail="Farm not found")
@@ -30,54 +55,147 @@ async def generate_recommendation(
     soil_data = farm.soil_data
     if not soil_data:
         raise HTTPException(
-            status_code=404, detail="Soil data not found for this farm. Cannot generate recommendation."
+            status_code=404,
+            detail="Soil data not found for this farm. Cannot generate recommendation. "
+            "Queue the lookup again with POST /api/farms/soil/retry.",
         )
 
-    # 2. Get Live Weather Data
-    weather_data = await fetch_weather_forecast(farm.latitude, farm.longitude)
-    if not weather_data or not weather_data.get("daily"):
+    # 2. Get Weather Data (live forecast, or long-term normals when requested or as a fallback)
+    weather_features, source = await get_weather_features(farm.latitude, farm.longitude, weather_source)
+    if not weather_features:
         raise HTTPException(status_code=503, detail="Could not retrieve valid weather data.")
 
     # 3. Prepare the 'live_features' dictionary for the model
-    # Process weather data to get averages over the next week
-    daily_forecasts = weather_data["daily"][:7]
-    avg_temp = sum(day['temp']['day'] for day in daily_forecasts) / len(daily_forecasts)
-    avg_humidity = sum(day['humidity'] for day in daily_forecasts) / len(daily_forecasts)
-    total_rainfall = sum(day.get('rain', 0) for day in daily_forecasts)
-    
     # Map the collected data to the feature names your model expects
     live_features = {
         'topsoil_phh2o': soil_data.ph,
-        'avg_temp_celsius': avg_temp,
-        'avg_humidity_percent': avg_humidity,
-        'total_rainfall_mm': total_rainfall,
+        **weather_features,
         # Placeholders for now, as SoilGrids free tier doesn't easily provide N, P, K
         'topsoil_nitrogen': 95, 
         'P_placeholder': 55,
         'K_placeholder': 45,
     }
+    return live_features, source
 
-    # 4. Run the ML Model
-    try:
-        final_recommendations = prediction_service.get_final_recommendations(live_features)
-        
-        # Sort recommendations by estimated profit
-        sorted_recommendations = sorted(
-            final_recommendations, 
-            key=lambda x: x['estimated_profit_rs_per_hectare'], 
-            reverse=True
-        )
-        return sorted_recommendations
 
+@router.get("/{farm_id}", dependencies=[Depends(rate_limit("recommendation", cost=10))])
+async def generate_recommendation(
+    farm_id: int,
+    request: Request,
+    response: Response,
+    weather_source: Literal["live", "climatology", "auto"] = "auto",
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+) -> Any:
+    live_features, source = await _get_live_features(farm_id, weather_source, db, current_user)
+    response.headers["X-Weather-Source"] = source
+
+    # The result is a pure function of the inputs and the models, so the client's copy
+    # can be validated before any inference runs
+    cache_key = json.dumps(live_features, sort_keys=True)
+    cached = not_modified(request, response, make_etag(cache_key, prediction_service.version, source), SHORT_LIVED)
+    if cached:
+        return cached
+
+    # 4. Run the ML Model (or reuse the result for identical inputs)
+    try:
+        entry = await _recommendation_cache.get_entry(cache_key)
+        if entry is not None:
+            return entry[0]
+        recommendations = await _recommendation_cache.fill(cache_key, lambda: _rank_recommendations(live_features))
+        if recommendations is None:
+            raise ValueError("No recommendations were produced")
+        return recommendations
+
+    except LimitExceeded:
+        raise
     except Exception as e:
         # Catch potential errors from the model prediction step
         print(f"Error during model prediction: {e}")
         raise HTTPException(status_code=500, detail="An error occurred during recommendation generation.")
 
 
+async def _rank_recommendations(live_features: dict) -> list[dict]:
+    async with inference_limiter.slot():
+        with stage("inference"):
+            final_recommendations = await run_in_threadpool(prediction_service.get_final_recommendations, live_features)
+
+    # Sort recommendations by estimated profit
+    return sorted(
+        final_recommendations,
+        key=lambda x: x['estimated_profit_rs_per_hectare'],
+        reverse=True
+    )
+
+
+@router.post(
+    "/{farm_id}/scenarios", response_model=schemas.ScenarioTable,
+    dependencies=[Depends(rate_limit("scenarios", cost=20))],
+)
+async def evaluate_scenarios(
+    farm_id: int,
+    grid: schemas.ScenarioGrid,
+    response: Response,
+    weather_source: Literal["live", "climatology", "auto"] = "auto",
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    What-if analysis: ranks crops for every combination of the rainfall, temperature,
+    humidity and market price perturbations in `grid`. Weather is fetched once and
+    the models run once over the whole scenario x crop matrix.
+    """
+    n_scenarios = len(grid.rainfall_pct) * len(grid.temperature_delta) * len(grid.humidity_pct) * len(grid.price_pct)
+    if not 1 <= n_scenarios <= MAX_SCENARIOS:
+        raise HTTPException(
+            status_code=422, detail=f"The grid must define between 1 and {MAX_SCENARIOS} scenarios, not {n_scenarios}."
+        )
+
+    live_features, source = await _get_live_features(farm_id, weather_source, db, current_user)
+    response.headers["X-Weather-Source"] = source
+
+    try:
+        scenarios = expand_scenarios(
+            live_features, grid.rainfall_pct, grid.temperature_delta, grid.humidity_pct, grid.price_pct
+        )
+        async with inference_limiter.slot():
+            with stage("inference"):
+                results = await run_in_threadpool(prediction_service.get_batch_recommendations, scenarios, grid.top_n)
+    except LimitExceeded:
+        raise
+    except Exception as e:
+        print(f"Error during scenario prediction: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred during scenario evaluation.")
+
+    # Rank each scenario's crops by estimated profit, as the single recommendation does
+    order = np.argsort(-results['profit'], axis=1, kind='stable')
+    ranked = {key: np.take_along_axis(values, order, axis=1) for key, values in results.items()}
+    rows = [
+        [
+            scenario,
+            rank + 1,
+            str(ranked['crop'][scenario, rank]).capitalize(),
+            round(float(ranked['predicted_yield'][scenario, rank]), 2),
+            round(float(ranked['sustainability'][scenario, rank]), 2),
+            round(float(ranked['profit'][scenario, rank]), 2),
+        ]
+        for scenario in range(len(scenarios))
+        for rank in range(ranked['crop'].shape[1])
+    ]
+    perturbations = scenarios[list(SCENARIO_COLUMNS)]
+    return schemas.ScenarioTable(
+        columns=[
+            "scenario", "rank", "crop", "predicted_yield_quintal_per_hectare",
+            "sustainability_score_10", "estimated_profit_rs_per_hectare",
+        ],
+        scenarios=perturbations.to_dict(orient='records'),
+        rows=rows,
+    )
+
+
 # The POST and GET history endpoints remain the same
 # You might want to update the schema to accept a JSON payload for saving
-@router.post("/save", response_model=schemas.Recommendation)
+@router.post("/save", response_model=schemas.Recommendation, dependencies=[Depends(rate_limit("save_recommendation"))])
 def save_recommendation(
     rec_data: schemas.RecommendationCreate,
     db: Session = Depends(get_db),
@@ -100,15 +218,31 @@ def save_recommendation(
     return new_rec
 
 
-@router.get("/history/{user_id}", response_model=List[schemas.Recommendation])
+@router.get(
+    "/history/{user_id}", response_model=List[schemas.Recommendation],
+    dependencies=[Depends(rate_limit("history"))],
+)
 def get_recommendation_history(
     user_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    
+
+    # Saved recommendations are append-only, so the count and highest id version the history
+    versions = (
+        db.query(func.count(models.Recommendation.id), func.max(models.Recommendation.id))
+        .join(models.Farm)
+        .filter(models.Farm.owner_id == user_id)
+        .one()
+    )
+    cached = not_modified(request, response, make_etag("history", user_id, *versions), REVALIDATE)
+    if cached:
+        return cached
+
     recommendations = (
         db.query(models.Recommendation)
         .join(models.Farm)
@@ -0,0 +1,202 @@
+import threading
+import time
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import JSON, cast, func, select, type_coerce
+from sqlalchemy.orm import Session, aliased
+
+from app.db import models, schemas
+from app.db.database import get_db
+from app.core.rate_limit import rate_limit
+from app.core.security import get_current_officer
+from app.services.geo import (
+    GEOHASH_PRECISION, decode_bbox, encode_geohash, farm_index, is_geohash, prefix_upper_bound,
+)
+
+MAX_RESULTS = 5000
+# A summary may split its cell into at most 32^3 groups
+MAX_EXTRA_PRECISION = 3
+
+router = APIRouter(
+    prefix="/api/regions", tags=["Regions"],
+    dependencies=[Depends(get_current_officer), Depends(rate_limit("regions", cost=2))],
+)
+
+_index_lock = threading.Lock()
+# Ids can commit out of order (e.g. Postgres sequences with concurrent inserts), so rows this far
+# below the highest indexed id are re-read every INDEX_RESCAN_SECONDS to catch late commits
+INDEX_RESCAN_IDS = 10_000
+INDEX_RESCAN_SECONDS = 30
+_last_rescan = 0.0
+
+
+def _refresh_farm_index(db: Session):
+    """
+    Adds farms created since the last refresh (by this or any other worker) to the in-memory index.
+    Farms are never moved or deleted, so new rows are found with a primary key range scan; a
+    periodic rescan of the trailing id window picks up rows that committed after higher ids.
+    """
+    global _last_rescan
+    with _index_lock:
+        since_id = farm_index.max_id
+        if time.monotonic() - _last_rescan >= INDEX_RESCAN_SECONDS:
+            since_id = max(0, since_id - INDEX_RESCAN_IDS)
+            _last_rescan = time.monotonic()
+        rows = db.execute(
+            select(models.Farm.id, models.Farm.latitude, models.Farm.longitude, models.Farm.geohash)
+            .where(models.Farm.id > since_id)
+            .order_by(models.Farm.id)
+        ).all()
+        for farm_id, latitude, longitude, geohash in rows:
+            if latitude is not None and longitude is not None:
+                farm_index.add(farm_id, latitude, longitude, geohash)
+        if rows:
+            farm_index.max_id = max(farm_index.max_id, rows[-1][0])
+
+
+def _load_farms(db: Session, farm_ids: list[int], distances: dict | None = None) -> list[schemas.NearbyFarm]:
+    farms = db.query(models.Farm).filter(models.Farm.id.in_(farm_ids)).all() if farm_ids else []
+    by_id = {farm.id: farm for farm in farms}
+    return [
+        schemas.NearbyFarm(
+            id=farm.id, name=farm.name, latitude=farm.latitude, longitude=farm.longitude,
+            owner_id=farm.owner_id, distance_km=round(distances[farm.id], 3) if distances else None,
+        )
+        for farm in (by_id[farm_id] for farm_id in farm_ids if farm_id in by_id)
+    ]
+
+
+def _cell(geohash: str) -> schemas.RegionCell:
+    min_lat, min_lon, max_lat, max_lon = decode_bbox(geohash)
+    return schemas.RegionCell(
+        cell=geohash, min_latitude=min_lat, min_longitude=min_lon, max_latitude=max_lat, max_longitude=max_lon
+    )
+
+
+@router.get("/farms/nearby", response_model=List[schemas.NearbyFarm])
+def find_farms_nearby(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=200),
+    limit: int = Query(500, ge=1, le=MAX_RESULTS),
+    db: Session = Depends(get_db),
+):
+    """
+    Farms within `radius_km` of a point, nearest first.
+    """
+    _refresh_farm_index(db)
+    matches = farm_index.within_radius(latitude, longitude, radius_km)[:limit]
+    return _load_farms(db, [farm_id for farm_id, _ in matches], dict(matches))
+
+
+@router.get("/farms/within", response_model=List[schemas.NearbyFarm])
+def find_farms_within(
+    min_latitude: float = Query(..., ge=-90, le=90),
+    min_longitude: float = Query(..., ge=-180, le=180),
+    max_latitude: float = Query(..., ge=-90, le=90),
+    max_longitude: float = Query(..., ge=-180, le=180),
+    limit: int = Query(500, ge=1, le=MAX_RESULTS),
+    db: Session = Depends(get_db),
+):
+    """
+    Farms inside a bounding box, in registration order.
+    """
+    if min_latitude > max_latitude or min_longitude > max_longitude:
+        raise HTTPException(status_code=422, detail="The minimum corner must be south-west of the maximum corner.")
+    _refresh_farm_index(db)
+    farm_ids = sorted(farm_index.within_bbox(min_latitude, min_longitude, max_latitude, max_longitude))[:limit]
+    return _load_farms(db, farm_ids)
+
+
+@router.get("/cell", response_model=schemas.RegionCell)
+def locate_cell(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    precision: int = Query(6, ge=1, le=GEOHASH_PRECISION),
+):
+    """
+    The geohash cell containing a point, e.g. precision 6 (~1.2 x 0.6 km) for a village.
+    """
+    return _cell(encode_geohash(latitude, longitude, precision))
+
+
+def _top_crop(db: Session):
+    # The top crop of a saved recommendation: recommendation_text is a JSON list ranked by profit.
+    # SQLite's JSON functions read the text directly (CAST AS JSON would make it a number).
+    column = models.Recommendation.recommendation_text
+    document = type_coerce(column, JSON) if db.get_bind().dialect.name == "sqlite" else cast(column, JSON)
+    return document[(0, "crop")].as_string()
+
+
+@router.get("/{cell}/summary", response_model=List[schemas.RegionSummary])
+def summarize_region(
+    cell: str,
+    precision: int | None = Query(None, ge=1, le=GEOHASH_PRECISION),
+    db: Session = Depends(get_db),
+):
+    """
+    Farm counts, average soil properties and the mix of recommended crops for the
+    farms in `cell`, grouped into sub-cells of `precision` characters (by default
+    one level finer than `cell`). Aggregation runs in the database over an index
+    range on the geohash column.
+    """
+    cell = cell.lower()
+    if not is_geohash(cell) or len(cell) > GEOHASH_PRECISION:
+        raise HTTPException(status_code=422, detail="Not a valid geohash cell.")
+    precision = precision or min(len(cell) + 1, GEOHASH_PRECISION)
+    if not len(cell) <= precision <= len(cell) + MAX_EXTRA_PRECISION:
+        raise HTTPException(
+            status_code=422,
+            detail=f"precision must be between {len(cell)} and {len(cell) + MAX_EXTRA_PRECISION} for this cell.",
+        )
+
+    Farm, SoilData, Recommendation = models.Farm, models.SoilData, models.Recommendation
+    sub_cell = func.substr(Farm.geohash, 1, precision)
+    upper = prefix_upper_bound(cell)
+    in_cell = [Farm.geohash >= cell] + ([Farm.geohash < upper] if upper else [])
+
+    soil_rows = db.execute(
+        select(
+            sub_cell, func.count(Farm.id), func.count(SoilData.id), func.avg(SoilData.ph),
+            func.avg(SoilData.organic_carbon), func.avg(SoilData.sand), func.avg(SoilData.silt), func.avg(SoilData.clay),
+        )
+        .select_from(Farm)
+        .outerjoin(SoilData, SoilData.farm_id == Farm.id)
+        .where(*in_cell)
+        .group_by(sub_cell)
+        .order_by(sub_cell)
+    ).all()
+
+    # Each farm's latest saved recommendation, found per farm through the (farm_id, created_at) index
+    earlier = aliased(Recommendation)
+    latest_id = select(func.max(earlier.id)).where(earlier.farm_id == Farm.id).correlate(Farm).scalar_subquery()
+    top_crop = _top_crop(db)
+    crop_rows = db.execute(
+        select(sub_cell, top_crop, func.count(Farm.id))
+        .select_from(Farm)
+        .join(Recommendation, Recommendation.id == latest_id)
+        .where(*in_cell)
+        .group_by(sub_cell, top_crop)
+    ).all()
+    crops = {}
+    for group, crop, count in crop_rows:
+        if crop:
+            crops.setdefault(group, {})[crop] = count
+
+    def rounded(value):
+        return None if value is None else round(value, 2)
+
+    return [
+        schemas.RegionSummary(
+            **_cell(group).dict(),
+            farm_count=farm_count,
+            soil_samples=soil_samples,
+            avg_ph=rounded(ph),
+            avg_organic_carbon=rounded(organic_carbon),
+            avg_sand=rounded(sand),
+            avg_silt=rounded(silt),
+            avg_clay=rounded(clay),
+            recommended_crops=dict(sorted(crops.get(group, {}).items(), key=lambda item: -item[1])),
+        )
+        for group, farm_count, soil_samples, ph, organic_carbon, sand, silt, clay in soil_rows
+    ]
@@ -0,0 +1,422 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.profiling import stage
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float | None = None, clock=time.monotonic):
+        """
+        A size-bounded LRU mapping that remembers when each entry was stored.
+        Entries older than `ttl` seconds are dropped on access; `ttl=None` keeps them
+        until they are evicted by size.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get_entry(self, key):
+        """
+        Returns (value, age_in_seconds), or None on a miss.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            age = self._clock() - stored_at
+            if self.ttl is not None and age > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value, age
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, self._clock())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# --- Cross-worker caching -------------------------------------------------
+#
+# TieredCache puts a per-process TTLCache in front of a backend shared by all
+# workers on the host (SQLite file) or the fleet (Redis protocol). Values are
+# JSON-compatible and stored as compact, optionally compressed, bytes.
+
+_RAW, _ZLIB = b"\x00", b"\x01"
+_COMPRESS_ABOVE = 512  # bytes
+
+
+def encode_value(value) -> bytes:
+    payload = json.dumps(value, separators=(",", ":")).encode()
+    if len(payload) > _COMPRESS_ABOVE:
+        return _ZLIB + zlib.compress(payload)
+    return _RAW + payload
+
+
+def decode_value(data: bytes):
+    header, payload = data[:1], data[1:]
+    if header == _ZLIB:
+        payload = zlib.decompress(payload)
+    return json.loads(payload)
+
+
+class SQLiteBackend:
+    def __init__(self, path: str):
+        """
+        Shared tier for workers on the same host, kept in a local SQLite file. Statements are
+        single-row primary key operations, but a write can wait on another worker's lock, so
+        they run in the threadpool rather than on the event loop. The file is opened (and
+        created) on first use, so importing the app doesn't touch the disk.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+    async def get(self, key: str) -> bytes | None:
+        return await run_in_threadpool(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await run_in_threadpool(self._set, key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Stores the value only if the key is absent (or expired). Returns whether it was stored."""
+        return await run_in_threadpool(self._add, key, value, ttl)
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self._delete, key)
+
+    async def incr(self, key: str, amount: float, ttl: float) -> float:
+        """Adds `amount` to a counter, creating it with `ttl` if absent. Returns the new total."""
+        return await run_in_threadpool(self._incr, key, amount, ttl)
+
+    def _connection(self):
+        # Called with self._lock held
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=0.2, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, time.time() + ttl)
+            )
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def _add(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl)
+            )
+            return cursor.rowcount == 1
+
+    def _delete(self, key):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _incr(self, key, amount, ttl):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # BEGIN IMMEDIATE takes the write lock up front, so the read and the write are atomic across workers
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                total = (float(row[0]) if row else 0.0) + amount
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, total, row[1] if row else now + ttl),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return total
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        """
+        Shared tier speaking the Redis protocol (RESP2): Redis, Valkey, KeyDB or the local
+        stand-in in scripts/fake_redis.py. Only GET, SET (PX/NX), DEL, INCRBYFLOAT and PEXPIRE are used.
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.password = parsed.password
+        self._connection = None
+        self._loop = None
+        self._lock = None
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self._connection = (reader, writer)
+        if self.password:
+            await self._send("AUTH", self.password)
+        if self.db:
+            await self._send("SELECT", str(self.db))
+
+    async def _send(self, *args):
+        reader, writer = self._connection
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        writer.write(b"".join(parts))
+        await writer.drain()
+        return await self._read_reply(reader)
+
+    async def _read_reply(self, reader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            return [await self._read_reply(reader) for _ in range(max(0, int(rest)))]
+        raise ConnectionError(f"Unexpected reply from cache server: {line!r}")
+
+    async def _command(self, *args):
+        # Connections belong to an event loop, so reconnect if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lock, self._connection = loop, asyncio.Lock(), None
+        async with self._lock:
+            try:
+                if self._connection is None:
+                    await self._connect()
+                return await self._send(*args)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                self._connection = None
+                raise
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._command("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self._command("SET", key, value, "PX", int(ttl * 1000))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return await self._command("SET", key, value, "PX", int(ttl * 1000), "NX") == "OK"
+
+    async def delete(self, key: str):
+        await self._command("DEL", key)
+
+    async def incr(self, key: str, amount: float, ttl: float) -> float:
+        total = float(await self._command("INCRBYFLOAT", key, repr(float(amount))))
+        if total == amount:
+            # This call created the counter
+            await self._command("PEXPIRE", key, int(ttl * 1000))
+        return total
+
+
+_shared_backend = None
+
+
+def get_shared_backend():
+    """
+    The process-wide shared tier selected by CACHE_BACKEND ("sqlite", "redis" or "memory").
+    """
+    global _shared_backend
+    if _shared_backend is None and settings.CACHE_BACKEND != "memory":
+        if settings.CACHE_BACKEND == "redis":
+            _shared_backend = RedisBackend(settings.CACHE_REDIS_URL)
+        else:
+            _shared_backend = SQLiteBackend(settings.CACHE_SQLITE_PATH)
+    return _shared_backend
+
+
+metrics.describe("cache_requests_total", "Cache lookups per namespace and tier, by result.")
+metrics.describe("cache_hit_ratio", "Hits / lookups per namespace and tier since startup.")
+
+_hit_stats = {}  # (namespace, tier) -> [hits, lookups]
+
+
+class TieredCache:
+    def __init__(self, namespace: str, version: str | int, ttl: float, local_maxsize: int, backend="default"):
+        """
+        An in-process LRU in front of the shared backend. Keys are namespaced and
+        versioned ("<namespace>:v<version>:<key>"), so bumping `version` when the
+        cached format or its inputs change invalidates old entries everywhere.
+
+        Entries live for `ttl` seconds; `get_entry` also reports their age so callers
+        can decide what counts as fresh.
+        """
+        self.namespace = namespace
+        self.prefix = f"{namespace}:v{version}:"
+        self.ttl = ttl
+        self._local = TTLCache(maxsize=local_maxsize, ttl=ttl)
+        self._backend_option = backend
+        self._inflight = {}
+        self._backend_failed = False
+
+    @property
+    def _backend(self):
+        # Resolved on use rather than at import, so importing the app doesn't open the shared tier
+        return get_shared_backend() if self._backend_option == "default" else self._backend_option
+
+    def _key(self, key) -> str:
+        return self.prefix + (key if isinstance(key, str) else json.dumps(key, separators=(",", ":")))
+
+    def _record(self, tier: str, hit: bool):
+        stats = _hit_stats.setdefault((self.namespace, tier), [0, 0])
+        stats[0] += hit
+        stats[1] += 1
+        metrics.inc("cache_requests_total", namespace=self.namespace, tier=tier, result="hit" if hit else "miss")
+        metrics.set("cache_hit_ratio", round(stats[0] / stats[1], 4), namespace=self.namespace, tier=tier)
+
+    async def _shared(self, method: str, *args):
+        # The shared tier is an optimisation: if it is down, behave like a miss
+        try:
+            with stage("cache.shared"):
+                result = await getattr(self._backend, method)(*args)
+        except Exception as e:
+            if not self._backend_failed:
+                print(f"Warning: shared cache unavailable for '{self.namespace}': {e}")
+                self._backend_failed = True
+            return None
+        self._backend_failed = False
+        return result
+
+    async def get_entry(self, key):
+        """
+        Returns (value, age_in_seconds), or None on a miss.
+        """
+        full_key = self._key(key)
+        entry = self._local.get(full_key)
+        self._record("local", entry is not None)
+        if entry is None and self._backend is not None:
+            data = await self._shared("get", full_key)
+            self._record("shared", data is not None)
+            if data is not None:
+                envelope = decode_value(data)
+                entry = (envelope["v"], envelope["t"])
+                self._local.set(full_key, entry)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        return value, max(0.0, time.time() - stored_at)
+
+    async def get(self, key, default=None):
+        entry = await self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    async def set(self, key, value):
+        full_key = self._key(key)
+        stored_at = time.time()
+        self._local.set(full_key, (value, stored_at))
+        if self._backend is not None:
+            await self._shared("set", full_key, encode_value({"v": value, "t": stored_at}), self.ttl)
+
+    async def fill(self, key, producer, lease_seconds: float = 10.0):
+        """
+        Computes a value with `await producer()` and stores it, with stampede protection:
+        concurrent callers in this process share one call, and across workers only the
+        holder of a short lease calls the producer while the others wait for its result.
+        Returns the new value, or None if the producer returned None.
+        """
+        full_key = self._key(key)
+        if full_key in self._inflight:
+            return await asyncio.shield(self._inflight[full_key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = future
+        try:
+            value = await self._fill(key, full_key, producer, lease_seconds)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[full_key]
+
+    async def _fill(self, key, full_key, producer, lease_seconds):
+        lease_key = full_key + ":lease"
+        # Taken before trying the lease, so a value the holder writes right after counts as new
+        started = time.time()
+        leased = True
+        if self._backend is not None:
+            leased = await self._shared("add", lease_key, b"1", lease_seconds) is not False
+
+        if not leased:
+            # Another worker is producing this value; wait for it rather than piling onto the upstream
+            while time.time() - started < lease_seconds:
+                await asyncio.sleep(0.05)
+                data = await self._shared("get", full_key)
+                if data is not None:
+                    envelope = decode_value(data)
+                    if envelope["t"] >= started:
+                        self._local.set(full_key, (envelope["v"], envelope["t"]))
+                        return envelope["v"]
+                if await self._shared("get", lease_key) is None:
+                    # Released without a value (the peer's producer failed or was shed): produce it here
+                    break
+            # Otherwise the peer is stuck or gone and its lease has expired, so produce the value ourselves
+
+        try:
+            value = await producer()
+            if value is not None:
+                await self.set(key, value)
+            return value
+        finally:
+            if leased and self._backend is not None:
+                await self._shared("delete", lease_key)
@@ -1,10 +1,40 @@
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
+    # Use SQLite for simplicity. In production, this would be PostgreSQL or MySQL.
+    DATABASE_URL: str = "sqlite:///./agri_advisor.db"
     SECRET_KEY: str = "a_very_secret_key_that_should_be_in_a_env_file"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     OPENWEATHER_API_KEY: str = "your_actual_api_key_here"
+    SOILGRIDS_BASE_URL: str = "https://rest.soilgrids.org"
+    OPENWEATHER_BASE_URL: str = "https://api.openweathermap.org"
+    CHATBOT_SERVICE_URL: str = ""  # External RAG/Gemini service; empty uses the built-in placeholder answer
+    CHATBOT_MAX_CONCURRENCY: int = 32  # Upstream calls in flight across all users
+    CHATBOT_MAX_PER_USER: int = 2
+    CHATBOT_ANSWER_TTL_SECONDS: int = 6 * 3600
+    CACHE_BACKEND: str = "sqlite"  # Shared cache tier: "sqlite" (per host), "redis" (per fleet) or "memory" (per worker)
+    CACHE_SQLITE_PATH: str = "./agri_cache.db"
+    CACHE_REDIS_URL: str = "redis://127.0.0.1:6379/0"
+    CLIMATOLOGY_PATH: str = "models/climatology.npy"
+    ADMIN_EMAILS: list[str] = []  # May use the profiling endpoints and /metrics; JSON list in the environment
+    METRICS_PUBLIC: bool = False  # Serve /metrics without authentication, for a scraper on a trusted network
+    SLOW_REQUEST_THRESHOLD_MS: float = 0  # Record requests slower than this; 0 disables recording (can be changed at runtime)
+    SLOW_REQUEST_BUFFER_SIZE: int = 200
+    # Budgets are counted in the shared cache tier, so they hold across workers; with CACHE_BACKEND=memory
+    # every worker enforces them separately (divide by the worker count to keep the same total)
+    RATE_LIMIT_PER_MINUTE: float = 120  # Request budget per user, in cost units (a plain read costs 1)
+    RATE_LIMIT_BURST: float = 60
+    LOGIN_RATE_LIMIT_PER_MINUTE: float = 10  # Per client IP, for login and registration
+    LOGIN_RATE_LIMIT_BURST: float = 10
+    # How often each worker adds its spend to the shared counts and reads the others'; budgets can
+    # overshoot by about what the other workers admit in this time
+    RATE_LIMIT_SYNC_SECONDS: float = 0.25
+    INFERENCE_MAX_CONCURRENCY: int = 4  # Model runs in flight per worker; roughly the CPU cores it may use
+    INFERENCE_MAX_QUEUE: int = 64
+    UPSTREAM_MAX_CONCURRENCY: int = 64  # SoilGrids/OpenWeatherMap calls in flight per worker
+    UPSTREAM_MAX_QUEUE: int = 256
+    OFFICER_EMAILS: list[str] = []  # District officers who may query all farms by region; JSON list in the environment
     
     class Config:
         env_file = ".env"
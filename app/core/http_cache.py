@@ -0,0 +1,38 @@
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+# Cache-Control per kind of response. Everything here is per user, so never "public".
+REVALIDATE = "private, no-cache" # Clients keep a copy but must check it (cheaply, with If-None-Match) before use
+SHORT_LIVED = "private, max-age=300"
+
+
+def make_etag(*parts) -> str:
+    """
+    A strong ETag for JSON-serializable parts: row versions, model inputs or the content itself.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":")).encode()
+    return f'"{hashlib.sha256(payload).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    return etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def not_modified(request: Request, response: Response, etag: str, cache_control: str) -> Response | None:
+    """
+    Sets ETag and Cache-Control on the route's response. Returns a bodiless 304 to send
+    instead when the client's copy is current, or None when the route should build the body.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={**headers, **response.headers})
+    response.headers.update(headers)
+    return None
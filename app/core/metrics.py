@@ -0,0 +1,52 @@
+import threading
+from collections import defaultdict
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        A minimal in-process counter/gauge store rendered in the Prometheus text format.
+        """
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._help = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def set(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def get(self, name: str, **labels) -> float:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0.0))
+
+    def render(self) -> str:
+        with self._lock:
+            series = [("counter", k, v) for k, v in self._counters.items()]
+            series += [("gauge", k, v) for k, v in self._gauges.items()]
+
+        lines = []
+        seen = set()
+        for kind, (name, labels), value in sorted(series, key=lambda s: s[1]):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Single registry shared by the whole process, exposed on /metrics
+metrics = MetricsRegistry()
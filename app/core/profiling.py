@@ -0,0 +1,214 @@
+import contextlib
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class SamplingProfiler:
+    def __init__(self):
+        """
+        A wall-clock sampling profiler: a background thread periodically snapshots the
+        stack of every other thread, so time spent waiting (locks, sockets, the event
+        loop's select) shows up as well as time on the CPU. Nothing runs between profiles.
+        """
+        self._lock = threading.Lock()
+        self.running = False
+
+    def profile(self, seconds: float, interval: float = 0.005) -> Counter:
+        """
+        Samples for `seconds` and returns a Counter of stacks (tuples of frames, root first).
+        Blocks the calling thread; raises ProfilerBusy if a profile is already running.
+        """
+        with self._lock:
+            if self.running:
+                raise ProfilerBusy("A profile is already running")
+            self.running = True
+        try:
+            return self._sample(seconds, interval)
+        finally:
+            self.running = False
+
+    def _sample(self, seconds, interval):
+        stacks = Counter()
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_label(frame))
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, f"thread-{thread_id}"))
+                stacks[tuple(reversed(frames))] += 1
+            time.sleep(interval)
+        return stacks
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_APP_ROOT):
+        filename = os.path.relpath(filename, _APP_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{code.co_name}"
+
+
+def collapse(stacks: Counter) -> str:
+    """
+    Renders stacks in the collapsed format ("frame;frame;frame count") read by
+    flamegraph.pl, speedscope and most other flame graph tools.
+    """
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+
+profiler = SamplingProfiler()
+
+
+# --- Slow-request capture -------------------------------------------------
+
+_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+class _Stage:
+    __slots__ = ("name", "timings", "started")
+
+    def __init__(self, name, timings):
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        entry = self.timings.setdefault(self.name, [0.0, 0])
+        entry[0] += time.perf_counter() - self.started
+        entry[1] += 1
+
+
+_NO_STAGE = contextlib.nullcontext()
+
+
+def stage(name: str):
+    """
+    Times a block as part of the current request's breakdown, e.g. `with stage("inference"):`.
+    Outside a recorded request this is a shared no-op context manager.
+    """
+    timings = _stages.get()
+    if timings is None:
+        return _NO_STAGE
+    return _Stage(name, timings)
+
+
+def add_stage_time(name: str, seconds: float):
+    """Adds time measured elsewhere (e.g. by event hooks) to the current request's breakdown."""
+    timings = _stages.get()
+    if timings is not None:
+        entry = timings.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+class SlowRequestRecorder:
+    def __init__(self, threshold_ms: float | None, capacity: int):
+        """
+        Keeps the stage breakdown of requests slower than `threshold_ms` in a ring buffer
+        of the `capacity` most recent ones. `threshold_ms=None` disables recording.
+        """
+        self.threshold_ms = threshold_ms
+        self.records = deque(maxlen=capacity)
+
+    def configure(self, threshold_ms: float | None, capacity: int | None = None):
+        if capacity is not None and capacity != self.records.maxlen:
+            self.records = deque(self.records, maxlen=capacity)
+        self.threshold_ms = threshold_ms
+
+    def record(self, scope, status_code, elapsed, timings, started_at=None):
+        stages = {name: {"ms": round(total * 1000, 3), "calls": calls} for name, (total, calls) in timings.items()}
+        route = scope.get("route")
+        self.records.append({
+            "started_at": started_at if started_at is not None else time.time() - elapsed,
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "route": getattr(route, "path", None),
+            "status_code": status_code,
+            "total_ms": round(elapsed * 1000, 3),
+            # Stages can overlap (concurrent awaits), so this can be negative
+            "unattributed_ms": round((elapsed - sum(total for total, _ in timings.values())) * 1000, 3),
+            "stages": stages,
+        })
+
+
+slow_requests = SlowRequestRecorder(
+    settings.SLOW_REQUEST_THRESHOLD_MS or None, settings.SLOW_REQUEST_BUFFER_SIZE
+)
+
+
+class RequestTimingMiddleware:
+    def __init__(self, app):
+        """
+        Pure ASGI middleware feeding `slow_requests`. While recording is disabled it
+        only checks one attribute per request.
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        threshold_ms = slow_requests.threshold_ms
+        if threshold_ms is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        token = _stages.set(timings)
+        status_code = None
+        finished = None  # (elapsed, timings) when the last body chunk was sent
+
+        async def send_wrapper(message):
+            nonlocal status_code, finished
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                finished = (time.perf_counter() - started, dict(timings))
+
+        started_at, started = time.time(), time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Background tasks run after the response is sent, so they don't count towards its latency
+            elapsed, stage_timings = finished or (time.perf_counter() - started, dict(timings))
+            _stages.reset(token)
+            if elapsed * 1000 >= threshold_ms:
+                slow_requests.record(scope, status_code or 500, elapsed, stage_timings, started_at)
+
+
+def instrument_engine(engine):
+    """
+    Adds time spent in SQL statements to the request breakdown as the "db" stage.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and _stages.get() is not None:
+            context.query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_started", None)
+        if started is not None:
+            add_stage_time("db", time.perf_counter() - started)
@@ -0,0 +1,274 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, Request
+
+from app.core.cache import get_shared_backend
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.profiling import stage
+from app.core.security import get_current_user
+from app.db import models
+from app.services.resilience import LimitExceeded
+
+metrics.describe("rate_limit_requests_total", "Requests checked by a rate limiter, by endpoint and result.")
+metrics.describe(
+    "rate_limit_fallback_total", "Requests checked against per-worker budgets because the shared tier was unavailable."
+)
+
+
+class TokenBucketLimiter:
+    def __init__(self, name: str, per_minute: float, burst: float, max_keys: int = 100_000, clock=time.monotonic):
+        """
+        One token bucket per key: each holds up to `burst` tokens and refills at `per_minute`.
+        A request spends its cost in tokens or is rejected. Keys idle the longest are forgotten
+        beyond `max_keys`, which only ever resets them to a full bucket.
+        """
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key, cost: float = 1) -> float:
+        """
+        Spends `cost` tokens from `key`'s bucket. Returns 0 when admitted, otherwise the
+        seconds until the bucket will hold enough tokens.
+        """
+        cost = min(cost, self.burst)
+        now = self._clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            admitted = tokens >= cost
+            if admitted:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0.0 if admitted else (cost - tokens) / self.rate
+
+
+class _WindowView:
+    __slots__ = ("window", "previous", "current", "synced_at")
+
+    def __init__(self, window: int, previous: float, current: float, synced_at: float):
+        """A worker's copy of one key's shared counts, plus what it admitted since they were read."""
+        self.window = window
+        self.previous = previous
+        self.current = current
+        self.synced_at = synced_at
+
+
+class SharedRateLimiter:
+    def __init__(
+        self, name: str, per_minute: float, burst: float, backend="default",
+        sync_interval: float = settings.RATE_LIMIT_SYNC_SECONDS, max_keys: int = 100_000, clock=time.time,
+    ):
+        """
+        The same budget as TokenBucketLimiter, but counted in the shared cache tier so it
+        holds across all workers (and hosts, with Redis) rather than per process.
+
+        Each key gets a counter per window of `burst / rate` seconds (the time a bucket
+        takes to refill), and a request is admitted while the sliding-window estimate
+        (the previous window's count, weighted by how much of it still overlaps, plus the
+        current count) stays within `burst`.
+
+        Only a key's first request (or the first after it went idle) waits on the shared
+        tier. After that each worker decides from its own copy of the counts, and a
+        background task adds its spend to the shared counters and reads the other
+        workers' every `sync_interval` seconds. Without a shared tier (CACHE_BACKEND=memory),
+        or while it is unreachable, each worker falls back to its own token buckets.
+        """
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.window = burst / self.rate
+        self.sync_interval = sync_interval
+        self.max_keys = max_keys
+        self._clock = clock
+        self._backend = get_shared_backend() if backend == "default" else backend
+        self._local = TokenBucketLimiter(name, per_minute, burst)
+        self._views = OrderedDict()  # key -> _WindowView
+        self._pending = {}  # key -> {window index: spend not yet added to the shared counter}
+        self._touched = set()  # keys to sync
+        self._sync_task = None
+        self._failed_until = 0.0
+        self._backend_failed = False
+
+    async def try_acquire(self, key, cost: float = 1) -> float:
+        """
+        Spends `cost` from `key`'s budget. Returns 0 when admitted, otherwise the
+        seconds until the request would be admitted.
+        """
+        if self._backend is None:
+            return self._local.try_acquire(key, cost)
+        cost = min(cost, self.burst)
+        now = self._clock()
+        if now < self._failed_until:
+            return self._fall_back(key, cost)
+        window_index, offset = divmod(now, self.window)
+        window_index = int(window_index)
+
+        view = self._fresh_view(key, window_index, now)
+        if view is None:
+            try:
+                return await self._try_acquire_shared(key, cost, window_index, offset, now)
+            except Exception as e:
+                self._backend_down(e)
+                return self._fall_back(key, cost)
+
+        self._touched.add(key)
+        self._schedule_sync()
+        overlap = 1 - offset / self.window
+        if view.previous * overlap + view.current + cost > self.burst:
+            return self._retry_after(view.previous, view.current, offset, cost)
+        view.current += cost
+        spent = self._pending.setdefault(key, {})
+        spent[window_index] = spent.get(window_index, 0) + cost
+        return 0.0
+
+    def _fresh_view(self, key, window_index: int, now: float) -> _WindowView | None:
+        # A view no sync has refreshed lately may be missing other workers' spend
+        view = self._views.get(key)
+        if view is None or now - view.synced_at > 3 * self.sync_interval:
+            return None
+        self._views.move_to_end(key)
+        if view.window != window_index:
+            view.previous = view.current if view.window == window_index - 1 else 0.0
+            view.current = 0.0
+            view.window = window_index
+        return view
+
+    async def _try_acquire_shared(self, key, cost: float, window_index: int, offset: float, now: float) -> float:
+        prefix = f"ratelimit:{self.name}:{key}:"
+        current_key = f"{prefix}{window_index}"
+        ttl = 2 * self.window
+        with stage("cache.shared"):
+            # Count first and refund on rejection, so concurrent requests can't both slip under the limit
+            current = await self._backend.incr(current_key, cost, ttl)
+            previous = float(await self._backend.get(f"{prefix}{window_index - 1}") or 0)
+            admitted = previous * (1 - offset / self.window) + current <= self.burst
+            if not admitted:
+                current = await self._backend.incr(current_key, -cost, ttl)
+        self._backend_failed = False
+        self._store_view(key, _WindowView(window_index, previous, current, now))
+        return 0.0 if admitted else self._retry_after(previous, current, offset, cost)
+
+    def _retry_after(self, previous: float, current: float, offset: float, cost: float) -> float:
+        # The estimate falls as the previous window slides out, then as the current one does
+        overlap = 1 - offset / self.window
+        excess = previous * overlap + current + cost - self.burst
+        if previous > 0 and excess <= previous * overlap:
+            return excess * self.window / previous
+        if current + cost <= self.burst:
+            return self.window - offset
+        return self.window - offset + self.window * (1 - (self.burst - cost) / current)
+
+    def _schedule_sync(self):
+        task = self._sync_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_loop())
+
+    async def _sync_loop(self):
+        while self._touched:
+            await asyncio.sleep(self.sync_interval)
+            touched, self._touched = self._touched, set()
+            for key in touched:
+                spent = self._pending.pop(key, {})
+                try:
+                    await self._sync_key(key, spent)
+                except Exception as e:
+                    self._backend_down(e)
+                    self._keep_unsynced(key, spent)
+                    # Retried with the next request that reaches the shared tier again
+                    self._touched.update(other for other in touched if other in self._pending)
+                    return
+
+    async def _sync_key(self, key, spent: dict):
+        prefix = f"ratelimit:{self.name}:{key}:"
+        counts = {}
+        while spent:
+            index, amount = next(iter(spent.items()))
+            counts[index] = await self._backend.incr(f"{prefix}{index}", amount, 2 * self.window)
+            del spent[index]
+        now = self._clock()
+        window_index = int(now // self.window)
+        for index in (window_index - 1, window_index):
+            if index not in counts:
+                counts[index] = float(await self._backend.get(f"{prefix}{index}") or 0)
+        self._backend_failed = False
+
+        # Add what this worker admitted while the counts were being read
+        unsynced = self._pending.get(key, {})
+        self._store_view(key, _WindowView(
+            window_index,
+            counts[window_index - 1] + unsynced.get(window_index - 1, 0),
+            counts[window_index] + unsynced.get(window_index, 0),
+            now,
+        ))
+
+    def _store_view(self, key, view: _WindowView):
+        self._views[key] = view
+        self._views.move_to_end(key)
+        if len(self._views) > self.max_keys:
+            self._views.popitem(last=False)
+
+    def _keep_unsynced(self, key, spent: dict):
+        # Spend from windows that have already slid out no longer counts towards any estimate
+        oldest = int(self._clock() // self.window) - 1
+        merged = self._pending.setdefault(key, {})
+        for index, amount in spent.items():
+            if index >= oldest:
+                merged[index] = merged.get(index, 0) + amount
+
+    def _backend_down(self, error: Exception):
+        self._failed_until = self._clock() + max(1.0, self.sync_interval)
+        if not self._backend_failed:
+            print(f"Warning: shared rate limit '{self.name}' unavailable, using per-worker budgets: {error}")
+            self._backend_failed = True
+
+    def _fall_back(self, key, cost: float) -> float:
+        metrics.inc("rate_limit_fallback_total", limiter=self.name)
+        return self._local.try_acquire(key, cost)
+
+
+# Request budgets: per user for authenticated endpoints, per client IP for login and registration
+user_limiter = SharedRateLimiter("user", settings.RATE_LIMIT_PER_MINUTE, settings.RATE_LIMIT_BURST)
+ip_limiter = SharedRateLimiter("ip", settings.LOGIN_RATE_LIMIT_PER_MINUTE, settings.LOGIN_RATE_LIMIT_BURST)
+
+
+async def _charge(limiter: SharedRateLimiter, key, cost: float, endpoint: str):
+    retry_after = await limiter.try_acquire(key, cost)
+    if retry_after:
+        metrics.inc("rate_limit_requests_total", limiter=limiter.name, endpoint=endpoint, result="rejected")
+        raise LimitExceeded("rate", retry_after=max(1, math.ceil(retry_after)))
+    metrics.inc("rate_limit_requests_total", limiter=limiter.name, endpoint=endpoint, result="admitted")
+
+
+def rate_limit(endpoint: str, cost: float = 1):
+    """
+    Dependency charging `cost` tokens to the authenticated user's budget, e.g.
+    `dependencies=[Depends(rate_limit("recommendation", cost=10))]`. Costs reflect how
+    expensive an endpoint is (upstream quota, inference CPU) relative to a plain read.
+    """
+    async def dependency(current_user: models.User = Depends(get_current_user)):
+        await _charge(user_limiter, current_user.id, cost, endpoint)
+
+    return dependency
+
+
+def ip_rate_limit(endpoint: str, cost: float = 1):
+    """
+    Dependency charging the client IP, for endpoints used before authentication. Run
+    uvicorn with --proxy-headers behind a proxy so the client's address is the one seen here.
+    """
+    async def dependency(request: Request):
+        await _charge(ip_limiter, request.client.host if request.client else "unknown", cost, endpoint)
+
+    return dependency
@@ -6,6 +6,7 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.profiling import stage
 from app.db import models, schemas
 from app.db.database import get_db
 
@@ -13,10 +14,12 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with stage("bcrypt"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    with stage("bcrypt"):
+        return pwd_context.hash(password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -52,4 +55,21 @@ def get_current_user(
     user = db.query(models.User).filter(models.User.email == token_data.email).first()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+def get_current_officer(current_user: Annotated[models.User, Depends(get_current_user)]):
+    """
+    Restricts region-wide endpoints, which see every user's farms, to district officers.
+    """
+    if current_user.email not in settings.OFFICER_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Officer access required")
+    return current_user
+
+
+def get_current_admin(current_user: Annotated[models.User, Depends(get_current_user)]):
+    """
+    Restricts the profiling endpoints and /metrics, which expose internals of every request, to administrators.
+    """
+    if current_user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator access required")
+    return current_user
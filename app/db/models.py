@@ -1,9 +1,19 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .database import Base
+from app.services.geo import encode_geohash
 import datetime
 
 
+def _farm_geohash(context):
+    # A column default rather than an ORM hook, so Core bulk inserts get it too
+    params = context.get_current_parameters()
+    latitude, longitude = params.get("latitude"), params.get("longitude")
+    if latitude is None or longitude is None:
+        return None
+    return encode_geohash(latitude, longitude)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -22,7 +32,8 @@ class Farm(Base):
     name = Column(String, index=True)
     latitude = Column(Float)
     longitude = Column(Float)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    geohash = Column(String(12), index=True, default=_farm_geohash) # Spatial cell; prefixes are coarser cells
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     soil_data = relationship("SoilData", back_populates="farm", uselist=False)
     recommendations = relationship("Recommendation", back_populates="farm")
@@ -43,6 +54,10 @@ class SoilData(Base):
 
 class Recommendation(Base):
     __tablename__ = "recommendations"
+    __table_args__ = (
+        # Serves both the farm_id foreign key and "latest recommendations for a farm"
+        Index("ix_recommendations_farm_id_created_at", "farm_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     farm_id = Column(Integer, ForeignKey("farms.id"))
@@ -53,10 +68,13 @@ class Recommendation(Base):
 
 class MarketData(Base):
     __tablename__ = "market_data"
+    __table_args__ = (
+        # Prices are looked up by (crop, market); the leading column also serves crop-only lookups
+        Index("ix_market_data_crop_name_market_name", "crop_name", "market_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    crop_name = Column(String, index=True, nullable=False)
+    crop_name = Column(String, nullable=False)
     market_name = Column(String, index=True) # e.g., "Nashik"
     price = Column(Float, nullable=False) # Price per quintal
     last_updated = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
-
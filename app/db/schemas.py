@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional , List, Any
 
 
@@ -50,6 +50,47 @@ class Farm(FarmBase):
     class Config:
         orm_mode = True # This allows the model to be created from ORM objects
 
+class FarmImportRow(BaseModel):
+    row: int # Line number for CSV (header is line 1), feature number for GeoJSON
+    status: str # "created", "invalid" or "failed"
+    farm_id: int | None = None
+    errors: List[str] = []
+
+class FarmImportReport(BaseModel):
+    created: int
+    failed: int
+    soil_lookups_queued: int # Distinct locations queued for SoilGrids enrichment
+    rows: List[FarmImportRow]
+
+class SoilRetryReport(BaseModel):
+    farms_missing_soil: int
+    soil_lookups_queued: int # Distinct locations queued for SoilGrids enrichment
+
+class NearbyFarm(BaseModel):
+    id: int
+    name: str
+    latitude: float
+    longitude: float
+    owner_id: int
+    distance_km: float | None = None # Only for radius queries
+
+class RegionCell(BaseModel):
+    cell: str # Geohash prefix
+    min_latitude: float
+    min_longitude: float
+    max_latitude: float
+    max_longitude: float
+
+class RegionSummary(RegionCell):
+    farm_count: int
+    soil_samples: int # Farms with soil data; the averages cover only these
+    avg_ph: float | None = None
+    avg_organic_carbon: float | None = None
+    avg_sand: float | None = None
+    avg_silt: float | None = None
+    avg_clay: float | None = None
+    recommended_crops: dict[str, int] = {} # Top crop of each farm's latest saved recommendation -> farms
+
 class RecommendationBase(BaseModel):
     recommendation_text: Any
 
@@ -66,6 +107,19 @@ class Recommendation(BaseModel):
     class Config:
         orm_mode = True
 
+class ScenarioGrid(BaseModel):
+    # Every combination of these values is evaluated
+    rainfall_pct: List[float] = [0] # % change to forecast rainfall, e.g. -30
+    temperature_delta: List[float] = [0] # °C added to the average temperature
+    humidity_pct: List[float] = [0] # % change to average humidity
+    price_pct: List[float] = [0] # % change to the market price, e.g. -20
+    top_n: int = Field(5, ge=1, le=10)
+
+class ScenarioTable(BaseModel):
+    columns: List[str]
+    scenarios: List[dict] # Perturbations applied in each scenario, indexed by scenario number
+    rows: List[List[Any]] # One row per (scenario, rank), in the order of `columns`
+
 class MarketData(BaseModel):
     crop_name: str
     market_name: str
@@ -75,9 +129,19 @@ class MarketData(BaseModel):
     class Config:
         orm_mode = True
 
+class SlowRequestConfig(BaseModel):
+    threshold_ms: float | None = Field(None, gt=0) # None disables recording
+    capacity: int | None = Field(None, ge=1, le=10_000)
+
+class SlowRequestLog(BaseModel):
+    threshold_ms: float | None
+    capacity: int
+    requests: List[dict] # method, path, route, status_code, total_ms, unattributed_ms, stages
+
 class ChatbotQuery(BaseModel):
     question: str
     language_code: str = "en-IN"
+    region: str | None = None
 
 class ChatbotResponse(BaseModel):
     answer: str
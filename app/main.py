@@ -1,16 +1,44 @@
 # In app/main.py
-from fastapi import FastAPI
-from .db import models
-from .db.database import engine
-from .api import auth, farms, recommendations
-models.Base.metadata.create_all(bind=engine)
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .api import admin, auth, chatbot, farms, recommendations, regions
+from .core.config import settings
+from .core.metrics import metrics
+from .core.profiling import RequestTimingMiddleware
+from .core.security import get_current_admin
+from .services.resilience import LimitExceeded
+# The schema is managed by Alembic: run `alembic upgrade head` before starting the app
 
 app = FastAPI(title="Agri-Advisor API")
+app.add_middleware(RequestTimingMiddleware) # Slow-request capture; idle unless enabled via /api/admin/slow-requests
 
 app.include_router(auth.router) # Include the router
 app.include_router(farms.router) # Include the farms router
 app.include_router(recommendations.router)
+app.include_router(chatbot.router)
+app.include_router(regions.router)
+app.include_router(admin.router)
+
+
+@app.exception_handler(LimitExceeded)
+async def limit_exceeded_handler(request: Request, exc: LimitExceeded):
+    # The caller's own limits are 429s; a saturated service is a 503 that any client may retry later
+    status_code = 503 if exc.scope == "global" else 429
+    return JSONResponse(
+        status_code=status_code, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)}
+    )
+
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the Agri-Advisor Platform Backend!"}
\ No newline at end of file
+    return {"message": "Welcome to the Agri-Advisor Platform Backend!"}
+
+
+# Breaker states, limiter saturation and cache hit rates are operational internals: admins only,
+# unless METRICS_PUBLIC opens the endpoint to a scraper on a trusted network
+@app.get(
+    "/metrics", response_class=PlainTextResponse, include_in_schema=False,
+    dependencies=[] if settings.METRICS_PUBLIC else [Depends(get_current_admin)],
+)
+def read_metrics():
+    return metrics.render()
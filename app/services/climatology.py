@@ -0,0 +1,99 @@
+import calendar
+import json
+import os
+
+import numpy as np
+
+from app.core.config import settings
+
+# Order of the variables along the last axis of the grid. The names match the
+# 'live_features' keys the recommendation models expect.
+CLIMATOLOGY_VARIABLES = ("avg_temp_celsius", "avg_humidity_percent", "total_rainfall_mm")
+
+# The live path sums rainfall over a 7-day forecast, so monthly totals are
+# scaled down to the same window.
+FORECAST_WINDOW_DAYS = 7
+
+
+class ClimatologyGrid:
+    def __init__(self, data, lat_min, lon_min, resolution):
+        """
+        Wraps a (n_lat, n_lon, 12, 3) array of monthly normals on a regular lat/lon grid.
+        Temperature (°C) and humidity (%) are monthly means; rainfall is the monthly total in mm.
+        Cells without data (e.g. over the sea) hold NaN.
+        """
+        if data.ndim != 4 or data.shape[2:] != (12, len(CLIMATOLOGY_VARIABLES)):
+            raise ValueError(f"Unexpected climatology grid shape: {data.shape}")
+        self.data = data
+        self.lat_min = float(lat_min)
+        self.lon_min = float(lon_min)
+        self.resolution = float(resolution)
+        self.n_lat, self.n_lon = data.shape[:2]
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-maps the grid from a .npy file. The georeference lives in a JSON
+        sidecar with the same name, e.g. climatology.npy + climatology.json.
+        """
+        with open(_metadata_path(path)) as f:
+            meta = json.load(f)
+        data = np.load(path, mmap_mode='r')
+        return cls(data, meta['lat_min'], meta['lon_min'], meta['resolution'])
+
+    @staticmethod
+    def save(path, data, lat_min, lon_min, resolution):
+        """
+        Writes a grid in the format expected by `load`. Used by scripts/build_climatology.py.
+        """
+        np.save(path, np.asarray(data, dtype=np.float32))
+        with open(_metadata_path(path), 'w') as f:
+            json.dump({'lat_min': lat_min, 'lon_min': lon_min, 'resolution': resolution}, f)
+
+    def lookup(self, latitude: float, longitude: float, month: int) -> dict | None:
+        """
+        Returns the climatological 'live_features' for a location and month (1-12),
+        or None if the point is outside the grid or the cell has no data.
+        """
+        i = int((latitude - self.lat_min) // self.resolution)
+        j = int((longitude - self.lon_min) // self.resolution)
+        if not (0 <= i < self.n_lat and 0 <= j < self.n_lon):
+            return None
+
+        temp, humidity, monthly_rainfall = (float(v) for v in self.data[i, j, month - 1])
+        if np.isnan(temp) or np.isnan(humidity) or np.isnan(monthly_rainfall):
+            return None
+
+        days_in_month = calendar.monthrange(2001, month)[1]
+        return {
+            'avg_temp_celsius': temp,
+            'avg_humidity_percent': humidity,
+            'total_rainfall_mm': monthly_rainfall * FORECAST_WINDOW_DAYS / days_in_month,
+        }
+
+
+def _metadata_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+
+def load_climatology(path) -> ClimatologyGrid | None:
+    """
+    Loads the climatology grid if it has been deployed, otherwise returns None.
+    """
+    if not os.path.exists(path):
+        print(
+            f"Warning: Climatology grid not found at {path}. Offline weather fallback is disabled "
+            "(build it with `python -m scripts.build_climatology`)."
+        )
+        return None
+    try:
+        grid = ClimatologyGrid.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Could not load climatology grid from {path}: {e}")
+        return None
+    print(f"✅ Climatology grid loaded ({grid.n_lat}x{grid.n_lon} cells).")
+    return grid
+
+
+# Single, shared grid loaded on startup; the memory map keeps it cheap across workers
+climatology = load_climatology(settings.CLIMATOLOGY_PATH)
@@ -1,5 +1,12 @@
+import datetime
 import httpx
 from app.core.config import settings
+from app.core.cache import TieredCache
+from app.core.profiling import stage
+from app.services.climatology import climatology
+from app.services.resilience import (
+    CircuitBreaker, CircuitOpenError, ConcurrencyLimiter, LimitExceeded, stale_while_revalidate,
+)
 
 # A dictionary to map our desired properties to SoilGrids property names
 SOIL_PROPERTIES = {
@@ -10,55 +17,42 @@ SOIL_PROPERTIES = {
     "clay": "clay",
 }
 
+soilgrids_breaker = CircuitBreaker("soilgrids", slow_call_duration=8.0)
+openweathermap_breaker = CircuitBreaker("openweathermap", slow_call_duration=4.0)
+
+# Caps upstream calls in flight across both APIs; when the queue is full, calls fail fast
+# and callers fall back to cached values or climatology instead of piling up
+upstream_limiter = ConcurrencyLimiter(
+    "upstream",
+    max_concurrent=settings.UPSTREAM_MAX_CONCURRENCY,
+    max_wait=2.0,
+    max_queue=settings.UPSTREAM_MAX_QUEUE,
+)
+
+# Last good upstream values, used for stale-while-revalidate and to fail over when a breaker is open.
+# Soil properties are effectively static, so they stay fresh for a long time; forecasts age quickly.
+# Both are shared between workers; bump a version when the cached shape changes.
+SOIL_FRESH_SECONDS = 30 * 24 * 3600
+WEATHER_FRESH_SECONDS = 30 * 60
+WEATHER_SERVE_STALE_SECONDS = 6 * 3600
+_soil_cache = TieredCache("soil", version=1, ttl=3 * SOIL_FRESH_SECONDS, local_maxsize=50_000)
+_weather_cache = TieredCache("weather", version=1, ttl=WEATHER_SERVE_STALE_SECONDS, local_maxsize=10_000)
+
+
 async def fetch_soil_data(latitude: float, longitude: float) -> dict | None:
     """
     Fetches predictive soil data from SoilGrids API for a given lat/lon.
     """
-    properties = ",".join(SOIL_PROPERTIES.values())
-    url = (
-        "https://rest.soilgrids.org/soilgrids/v2.0/properties/query"
-        f"?lon={longitude}&lat={latitude}&property={properties}"
-        "&depth=0-5cm&value=mean"
+    return await stale_while_revalidate(
+        _soil_cache,
+        (round(latitude, 4), round(longitude, 4)),
+        lambda: _guarded(soilgrids_breaker, _request_soil_data, latitude, longitude),
+        fresh_for=SOIL_FRESH_SECONDS,
+        serve_stale_for=SOIL_FRESH_SECONDS,
+        name=soilgrids_breaker.name,
     )
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=20.0)
-            response.raise_for_status()  # Raise an exception for 4XX/5XX responses
-            data = response.json()
-
-        # Parse the complex SoilGrids response to a simple dictionary
-        raw_properties = data.get("properties", {}).get("layers", [])
-
-        parsed_data = {}
-        for layer in raw_properties:
-            prop_name = layer.get("name")
-            # Find our key by looking up the SoilGrids value
-            local_key = next((k for k, v in SOIL_PROPERTIES.items() if v == prop_name), None)
-
-            if local_key:
-                # SoilGrids values are typically integers, scaled by a factor
-                value = layer.get("depths", [{}])[0].get("values", {}).get("mean")
-                unit_measure = layer.get("unit_measure")
-
-                # SoilGrids provides pH scaled by 10, organic carbon by 10, and textures by 10
-                # For example, a pH of 7.2 is returned as 72.
-                if value is not None:
-                     # Textures (sand, silt, clay) are g/kg, so no conversion needed
-                    if local_key in ["sand", "silt", "clay"]:
-                        parsed_data[local_key] = value
-                    else: # Convert other properties by dividing by 10
-                        parsed_data[local_key] = value / 10.0
-
-        return parsed_data if len(parsed_data) == len(SOIL_PROPERTIES) else None
-
-    except httpx.RequestError as exc:
-        print(f"An error occurred while requesting from SoilGrids: {exc}")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred during soil data parsing: {e}")
-        return None
-    
+
 async def fetch_weather_forecast(latitude: float, longitude: float) -> dict | None:
     """
     Fetches a 7-day weather forecast from OpenWeatherMap.
@@ -67,17 +61,118 @@ async def fetch_weather_forecast(latitude: float, longitude: float) -> dict | No
         print("Warning: OPENWEATHER_API_KEY is not set.")
         return None
 
+    # Forecasts are cached on a ~1 km grid, well below the resolution of the forecast itself
+    return await stale_while_revalidate(
+        _weather_cache,
+        (round(latitude, 2), round(longitude, 2)),
+        lambda: _guarded(openweathermap_breaker, _request_weather_forecast, latitude, longitude),
+        fresh_for=WEATHER_FRESH_SECONDS,
+        serve_stale_for=WEATHER_SERVE_STALE_SECONDS,
+        name=openweathermap_breaker.name,
+    )
+
+
+async def _guarded(breaker: CircuitBreaker, request, latitude: float, longitude: float) -> dict | None:
+    """
+    Runs an upstream request through its circuit breaker, returning None on any failure.
+    """
+    try:
+        async with upstream_limiter.slot():
+            with stage(f"upstream.{breaker.name}"):
+                return await breaker.call(request, latitude, longitude)
+    except LimitExceeded:
+        # Shed under load; counted in the limiter's metrics
+        return None
+    except CircuitOpenError:
+        # Already reported when the breaker opened; rejected calls are counted in the metrics
+        return None
+    except httpx.HTTPError as exc:
+        print(f"An error occurred while requesting from {breaker.name}: {exc}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred while processing {breaker.name} data: {e}")
+        return None
+
+
+async def _request_soil_data(latitude: float, longitude: float) -> dict | None:
+    properties = ",".join(SOIL_PROPERTIES.values())
+    url = (
+        f"{settings.SOILGRIDS_BASE_URL}/soilgrids/v2.0/properties/query"
+        f"?lon={longitude}&lat={latitude}&property={properties}"
+        "&depth=0-5cm&value=mean"
+    )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url, timeout=20.0)
+        response.raise_for_status()  # Raise an exception for 4XX/5XX responses
+        data = response.json()
+
+    # Parse the complex SoilGrids response to a simple dictionary
+    raw_properties = data.get("properties", {}).get("layers", [])
+
+    parsed_data = {}
+    for layer in raw_properties:
+        prop_name = layer.get("name")
+        # Find our key by looking up the SoilGrids value
+        local_key = next((k for k, v in SOIL_PROPERTIES.items() if v == prop_name), None)
+
+        if local_key:
+            # SoilGrids values are typically integers, scaled by a factor
+            value = layer.get("depths", [{}])[0].get("values", {}).get("mean")
+
+            # SoilGrids provides pH scaled by 10, organic carbon by 10, and textures by 10
+            # For example, a pH of 7.2 is returned as 72.
+            if value is not None:
+                 # Textures (sand, silt, clay) are g/kg, so no conversion needed
+                if local_key in ["sand", "silt", "clay"]:
+                    parsed_data[local_key] = value
+                else: # Convert other properties by dividing by 10
+                    parsed_data[local_key] = value / 10.0
+
+    return parsed_data if len(parsed_data) == len(SOIL_PROPERTIES) else None
+
+
+async def _request_weather_forecast(latitude: float, longitude: float) -> dict:
     # The One Call API provides daily forecasts
     url = (
-        "https://api.openweathermap.org/data/3.0/onecall"
+        f"{settings.OPENWEATHER_BASE_URL}/data/3.0/onecall"
         f"?lat={latitude}&lon={longitude}&exclude=current,minutely,hourly,alerts"
         f"&appid={settings.OPENWEATHER_API_KEY}&units=metric"
     )
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=10.0)
-            response.raise_for_status()
-            return response.json()
-    except httpx.RequestError as exc:
-        print(f"An error occurred while requesting from OpenWeatherMap: {exc}")
-        return None
\ No newline at end of file
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url, timeout=10.0)
+        response.raise_for_status()
+        return response.json()
+
+
+def summarize_weather(weather_data: dict | None) -> dict | None:
+    """
+    Reduces a One Call forecast to the weekly averages the models expect.
+    """
+    if not weather_data or not weather_data.get("daily"):
+        return None
+
+    daily_forecasts = weather_data["daily"][:7]
+    return {
+        "avg_temp_celsius": sum(day["temp"]["day"] for day in daily_forecasts) / len(daily_forecasts),
+        "avg_humidity_percent": sum(day["humidity"] for day in daily_forecasts) / len(daily_forecasts),
+        "total_rainfall_mm": sum(day.get("rain", 0) for day in daily_forecasts),
+    }
+
+
+async def get_weather_features(latitude: float, longitude: float, source: str = "auto") -> tuple[dict | None, str]:
+    """
+    Resolves the weather part of the model features and reports where it came from.
+
+    - "live": OpenWeatherMap only.
+    - "climatology": long-term monthly normals from the local grid, no network call.
+    - "auto": OpenWeatherMap, falling back to climatology if the API fails.
+    """
+    if source != "climatology":
+        features = summarize_weather(await fetch_weather_forecast(latitude, longitude))
+        if features or source == "live":
+            return features, "live"
+
+    if climatology is None:
+        return None, "climatology"
+    return climatology.lookup(latitude, longitude, datetime.date.today().month), "climatology"
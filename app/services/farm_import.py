@@ -0,0 +1,307 @@
+import asyncio
+import csv
+import io
+import json
+import time
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+
+from app.db import models, schemas
+from app.db.database import SessionLocal
+from app.services.data_ingestion import fetch_soil_data
+
+# Rows per INSERT/transaction. Large enough to amortise the commit, small enough
+# that one bad chunk does not roll back a whole village.
+IMPORT_CHUNK_SIZE = 500
+SOIL_LOOKUP_CONCURRENCY = 8
+# Soil rows are written at least this often (seconds) while lookups are still running
+SOIL_FLUSH_SECONDS = 5
+# Seconds to wait before retrying failed soil lookups, once; long enough for an open SoilGrids
+# breaker to let probes through again. Later retries are left to POST /api/farms/soil/retry.
+SOIL_RETRY_DELAYS = (35,)
+
+
+def iter_csv_rows(fileobj):
+    """
+    Yields (row_number, row) from a CSV upload with name, latitude and longitude columns.
+    Row numbers count the header as row 1, as a spreadsheet would.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline=""))
+    for row_number, row in enumerate(reader, start=2):
+        yield row_number, row
+
+
+def iter_geojson_rows(fileobj):
+    """
+    Yields (feature_number, row) from a GeoJSON FeatureCollection (or a bare list of
+    Features) with Point geometries, reading the features one at a time.
+    """
+    for feature_number, feature in enumerate(_iter_geojson_features(fileobj), start=1):
+        if not isinstance(feature, dict):
+            yield feature_number, {"_error": "Not a GeoJSON Feature object"}
+            continue
+        geometry = feature.get("geometry")
+        properties = feature.get("properties")
+        if not isinstance(properties, dict):
+            properties = {}
+        coordinates = geometry.get("coordinates") if isinstance(geometry, dict) else None
+        if (
+            not isinstance(geometry, dict) or geometry.get("type") != "Point"
+            or not isinstance(coordinates, list) or len(coordinates) < 2
+        ):
+            yield feature_number, {"_error": "Only Point geometries are supported"}
+            continue
+        longitude, latitude = coordinates[:2]
+        yield feature_number, {"name": properties.get("name"), "latitude": latitude, "longitude": longitude}
+
+
+def validate_row(row: dict) -> tuple[schemas.FarmCreate | None, list[str]]:
+    if "_error" in row:
+        return None, [row["_error"]]
+    try:
+        farm = schemas.FarmCreate(**{key: row.get(key) for key in ("name", "latitude", "longitude")})
+    except ValidationError as e:
+        return None, [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()]
+
+    errors = []
+    if not -90 <= farm.latitude <= 90:
+        errors.append("latitude: must be between -90 and 90")
+    if not -180 <= farm.longitude <= 180:
+        errors.append("longitude: must be between -180 and 180")
+    return (None, errors) if errors else (farm, [])
+
+
+def import_farms(db, rows, owner_id: int) -> tuple[list[schemas.FarmImportRow], dict]:
+    """
+    Validates rows as they are read and inserts the valid ones in chunked bulk INSERTs,
+    committing once per chunk.
+
+    Returns the per-row report and the new farm ids grouped by location, so that each
+    distinct location is only looked up in SoilGrids once.
+    """
+    report = []
+    locations = {}
+    pending = []  # (report_entry, farm)
+
+    def flush():
+        if not pending:
+            return
+        try:
+            farm_ids = db.scalars(
+                insert(models.Farm).returning(models.Farm.id, sort_by_parameter_order=True),
+                [{**farm.dict(), "owner_id": owner_id} for _, farm in pending],
+            ).all()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error inserting farm import chunk: {e}")
+            for entry, _ in pending:
+                entry.status = "failed"
+                entry.errors = ["Could not be saved"]
+        else:
+            for (entry, farm), farm_id in zip(pending, farm_ids):
+                entry.farm_id = farm_id
+                locations.setdefault(_location_key(farm.latitude, farm.longitude), []).append(farm_id)
+        pending.clear()
+
+    row_number = 0
+    try:
+        for row_number, row in rows:
+            farm, errors = validate_row(row)
+            entry = schemas.FarmImportRow(row=row_number, status="created" if farm else "invalid", errors=errors)
+            report.append(entry)
+            if farm:
+                pending.append((entry, farm))
+                if len(pending) >= IMPORT_CHUNK_SIZE:
+                    flush()
+    except (ValueError, csv.Error) as e:
+        # A malformed file stops the import; everything read up to this point is still saved
+        report.append(schemas.FarmImportRow(row=row_number + 1, status="invalid", errors=[f"Malformed file: {e}"]))
+    flush()
+    return report, locations
+
+
+async def enrich_soil_data(locations: dict, retry_delays=SOIL_RETRY_DELAYS):
+    """
+    Fetches soil properties once per distinct location and stores them for every farm there,
+    writing them in chunks as lookups finish. Locations that failed are retried after each of
+    `retry_delays` seconds; anything still missing waits for POST /api/farms/soil/retry.
+    Runs as a background task after the import response has been sent.
+    """
+    pending = dict(locations)
+    for attempt, delay in enumerate((0, *retry_delays)):
+        if not pending:
+            return
+        if delay:
+            print(f"Retrying soil lookups for {len(pending)} imported location(s) in {delay} s (retry {attempt}).")
+            await asyncio.sleep(delay)
+        pending = await _enrich_once(pending)
+    if pending:
+        print(
+            f"Warning: Could not fetch soil data for {len(pending)} imported location(s); "
+            "they can be queued again with POST /api/farms/soil/retry."
+        )
+
+
+async def _enrich_once(locations: dict) -> dict:
+    """
+    One pass of lookups over `locations`. Returns the locations that could not be fetched.
+    """
+    semaphore = asyncio.Semaphore(SOIL_LOOKUP_CONCURRENCY)
+
+    async def lookup(location):
+        async with semaphore:
+            return location, await fetch_soil_data(*location)
+
+    missing = {}
+    soil_rows = []
+    flushed_at = time.monotonic()
+    db = SessionLocal()
+    try:
+        for next_result in asyncio.as_completed([lookup(location) for location in locations]):
+            location, soil_properties = await next_result
+            if not soil_properties:
+                missing[location] = locations[location]
+                continue
+            soil_rows.extend({**soil_properties, "farm_id": farm_id} for farm_id in locations[location])
+            if len(soil_rows) >= IMPORT_CHUNK_SIZE or time.monotonic() - flushed_at >= SOIL_FLUSH_SECONDS:
+                _store_soil_rows(db, soil_rows, missing, locations)
+                flushed_at = time.monotonic()
+        _store_soil_rows(db, soil_rows, missing, locations)
+    finally:
+        db.close()
+    return missing
+
+
+def _store_soil_rows(db, soil_rows: list, missing: dict, locations: dict):
+    """
+    Inserts and commits buffered soil rows, skipping farms that already have soil data
+    (e.g. from an overlapping retry). A chunk that cannot be saved is added to `missing`.
+    """
+    if not soil_rows:
+        return
+    try:
+        existing = set(db.scalars(
+            select(models.SoilData.farm_id).where(models.SoilData.farm_id.in_([row["farm_id"] for row in soil_rows]))
+        ))
+        new_rows = [row for row in soil_rows if row["farm_id"] not in existing]
+        if new_rows:
+            db.execute(insert(models.SoilData), new_rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error storing soil data for imported farms: {e}")
+        failed_farms = {row["farm_id"] for row in soil_rows}
+        for location, farm_ids in locations.items():
+            if failed_farms.intersection(farm_ids):
+                missing[location] = farm_ids
+    soil_rows.clear()
+
+
+def farms_missing_soil(db, owner_id: int) -> dict:
+    """
+    The owner's farms that have no soil data yet, grouped by location as `import_farms` returns them.
+    """
+    rows = db.execute(
+        select(models.Farm.id, models.Farm.latitude, models.Farm.longitude)
+        .outerjoin(models.SoilData, models.SoilData.farm_id == models.Farm.id)
+        .where(models.Farm.owner_id == owner_id, models.SoilData.id.is_(None))
+    ).all()
+    locations = {}
+    for farm_id, latitude, longitude in rows:
+        locations.setdefault(_location_key(latitude, longitude), []).append(farm_id)
+    return locations
+
+
+def _location_key(latitude: float, longitude: float):
+    # Same rounding as the soil cache in data_ingestion (~11 m)
+    return (round(latitude, 4), round(longitude, 4))
+
+
+class _JSONStream:
+    def __init__(self, fileobj, chunk_size: int = 64 * 1024):
+        """
+        Just enough of an incremental JSON reader to walk a FeatureCollection
+        one feature at a time without holding the whole document in memory.
+        """
+        self._reader = io.TextIOWrapper(fileobj, encoding="utf-8-sig")
+        self._decoder = json.JSONDecoder()
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._reader.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it, or '' at the end."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected '{char}', found '{found or 'end of file'}'")
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def array_items(self):
+        self.expect("[")
+        first = True
+        while True:
+            if self.peek() == "]":
+                self._pos += 1
+                return
+            if not first:
+                self.expect(",")
+            first = False
+            yield self.value()
+
+
+def _iter_geojson_features(fileobj):
+    stream = _JSONStream(fileobj)
+    if stream.peek() == "[":
+        yield from stream.array_items()
+        return
+
+    stream.expect("{")
+    first = True
+    while stream.peek() != "}":
+        if not first:
+            stream.expect(",")
+        first = False
+        key = stream.value()
+        stream.expect(":")
+        if key == "features":
+            yield from stream.array_items()
+            return
+        stream.value()
@@ -0,0 +1,185 @@
+import math
+import threading
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: index for index, char in enumerate(_BASE32)}
+EARTH_RADIUS_KM = 6371.0088
+
+# Stored on every farm; any prefix of it is a coarser cell (5 ~ 4.9 km, 6 ~ 1.2 x 0.6 km, 9 ~ 5 m)
+GEOHASH_PRECISION = 9
+# Cell size of the in-memory index buckets
+INDEX_PRECISION = 5
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """
+    Encodes a point as a geohash. Points sharing a prefix lie in the same cell.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        if coordinate >= middle:
+            value = value << 1 | 1
+            interval[0] = middle
+        else:
+            value <<= 1
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def decode_bbox(geohash: str) -> tuple[float, float, float, float]:
+    """
+    Returns the cell's (min_lat, min_lon, max_lat, max_lon).
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def is_geohash(value: str) -> bool:
+    return bool(value) and all(char in _DECODE for char in value)
+
+
+def prefix_upper_bound(prefix: str) -> str | None:
+    """
+    The smallest geohash that sorts after every geohash starting with `prefix`, so
+    `prefix <= geohash < upper` selects the cell with a plain index range scan.
+    Returns None when the cell extends to the end of the key space.
+    """
+    while prefix:
+        index = _DECODE[prefix[-1]]
+        if index + 1 < len(_BASE32):
+            return prefix[:-1] + _BASE32[index + 1]
+        prefix = prefix[:-1]
+    return None
+
+
+def _cell_size(precision: int) -> tuple[float, float]:
+    """(height, width) of a cell in degrees."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def _cell_count(min_lat, min_lon, max_lat, max_lon, precision: int) -> int:
+    height, width = _cell_size(precision)
+    rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+    columns = math.floor(max_lon / width) - math.floor(min_lon / width) + 1
+    return rows * columns
+
+
+def covering_cells(min_lat: float, min_lon: float, max_lat: float, max_lon: float, precision: int) -> set[str]:
+    """
+    Geohash cells of the given precision that together cover the bounding box.
+    """
+    height, width = _cell_size(precision)
+    cells = set()
+    lat = math.floor(min_lat / height) * height
+    while lat <= max_lat:
+        lon = math.floor(min_lon / width) * width
+        while lon <= max_lon:
+            cells.add(encode_geohash(min(lat + height / 2, 90.0), min(lon + width / 2, 180.0), precision))
+            lon += width
+        lat += height
+    return cells
+
+
+def bbox_around(latitude: float, longitude: float, radius_km: float) -> tuple[float, float, float, float]:
+    """
+    A bounding box containing every point within `radius_km` of the center.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    delta_lon = 180.0 if cos_lat < 1e-6 else min(180.0, delta_lat / cos_lat)
+    return (
+        max(-90.0, latitude - delta_lat),
+        max(-180.0, longitude - delta_lon),
+        min(90.0, latitude + delta_lat),
+        min(180.0, longitude + delta_lon),
+    )
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    def __init__(self, precision: int = INDEX_PRECISION):
+        """
+        An in-memory point index bucketed by geohash cell. Radius and bounding-box
+        queries only look at the buckets overlapping the query area.
+        """
+        self.precision = precision
+        self.max_id = 0
+        self._buckets = {}  # cell -> [(item_id, latitude, longitude)]
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def add(self, item_id: int, latitude: float, longitude: float, geohash: str | None = None):
+        """Adds a point; adding an item that is already indexed does nothing."""
+        cell = (geohash or encode_geohash(latitude, longitude, self.precision))[:self.precision]
+        with self._lock:
+            if item_id in self._ids:
+                return
+            self._ids.add(item_id)
+            self._buckets.setdefault(cell, []).append((item_id, latitude, longitude))
+            self.max_id = max(self.max_id, item_id)
+
+    def __contains__(self, item_id):
+        return item_id in self._ids
+
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon) -> list[tuple[int, float, float]]:
+        # Very large areas: match buckets against coarser cells so the number of cells stays small
+        precision = self.precision
+        while precision > 1 and _cell_count(min_lat, min_lon, max_lat, max_lon, precision) > 1024:
+            precision -= 1
+        cells = covering_cells(min_lat, min_lon, max_lat, max_lon, precision)
+        with self._lock:
+            if precision == self.precision:
+                return [item for cell in cells for item in self._buckets.get(cell, ())]
+            return [item for cell, items in self._buckets.items() if cell[:precision] in cells for item in items]
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> list[int]:
+        return [
+            item_id
+            for item_id, lat, lon in self._candidates(min_lat, min_lon, max_lat, max_lon)
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+        ]
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float) -> list[tuple[int, float]]:
+        """
+        Returns (item_id, distance_km) pairs within `radius_km`, nearest first.
+        """
+        matches = []
+        for item_id, lat, lon in self._candidates(*bbox_around(latitude, longitude, radius_km)):
+            distance = haversine_km(latitude, longitude, lat, lon)
+            if distance <= radius_km:
+                matches.append((item_id, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+    def __len__(self):
+        return len(self._ids)
+
+
+# Farm locations, kept current by the regions API
+farm_index = SpatialIndex()
@@ -35,7 +35,14 @@ def fetch_and_store_market_data(db: Session):
             price = float(record.get("modal_price"))
 
             # Check if the crop already exists and update it, or create a new entry
-            db_crop = db.query(models.MarketData).filter(models.MarketData.crop_name == crop_name).first()
+            db_crop = (
+                db.query(models.MarketData)
+                .filter(
+                    models.MarketData.crop_name == crop_name,
+                    models.MarketData.market_name == record.get("market"),
+                )
+                .first()
+            )
             if db_crop:
                 db_crop.price = price
             else:
@@ -1,7 +1,24 @@
+import hashlib
 import os
 import joblib
+import numpy as np
 import pandas as pd
 
+# Used for profit estimates when no live market price is available (Rs per quintal)
+DEFAULT_MARKET_PRICE = 2500
+# Bump when the way features are fed to the models changes, so cached predictions are invalidated
+FEATURE_PIPELINE_REVISION = 2
+# Recommender column -> ('live_features' key, default when the key is missing)
+RECOMMENDER_FEATURES = {
+    'N': ('topsoil_nitrogen', 100), # Placeholder if Nitrogen not available
+    'P': ('P_placeholder', 50),
+    'K': ('K_placeholder', 50),
+    'temperature': ('avg_temp_celsius', None),
+    'humidity': ('avg_humidity_percent', None),
+    'ph': ('topsoil_phh2o', None),
+    'rainfall': ('total_rainfall_mm', None),
+}
+
 class PredictionService:
     def __init__(self, model_dir='models'):
         """
@@ -17,70 +34,146 @@ class PredictionService:
 
         self.sustainability_scores = pd.read_csv(os.path.join(model_dir, 'sustainability_scores.csv')).set_index('label')
         self.cost_of_cultivation = joblib.load(os.path.join(model_dir, 'cost_of_cultivation.pkl'))
-        print("✅ Artifacts loaded successfully.")
+        # Model inputs are assembled as plain matrices, in the column order the scalers were fitted on
+        self._recommender_columns = list(getattr(self.crop_scaler, 'feature_names_in_', RECOMMENDER_FEATURES))
+        self._yield_columns = list(getattr(self.yield_scaler, 'feature_names_in_', self.yield_model_columns))
+        self.version = self._artifacts_version(model_dir)
+        print(f"✅ Artifacts loaded successfully (version {self.version}).")
+
+    @staticmethod
+    def _artifacts_version(model_dir):
+        """
+        A short content hash of the model artifacts and the feature pipeline revision,
+        used to version cached predictions.
+        """
+        digest = hashlib.sha256(f"pipeline-{FEATURE_PIPELINE_REVISION}".encode())
+        for name in sorted(os.listdir(model_dir)):
+            if name.endswith(('.pkl', '.csv')):
+                digest.update(name.encode())
+                with open(os.path.join(model_dir, name), 'rb') as f:
+                    digest.update(f.read())
+        return digest.hexdigest()[:12]
+
+    def _recommender_matrix(self, features):
+        """
+        Builds the recommender input, one row per row of a DataFrame of 'live_features'.
+        """
+        return np.column_stack([
+            features[key].to_numpy(dtype=float) if key in features else np.full(len(features), default, dtype=float)
+            for key, default in (RECOMMENDER_FEATURES[col] for col in self._recommender_columns)
+        ])
+
+    def _recommender_row(self, live_features):
+        """
+        Builds the recommender input for a single 'live_features' dict, as a (1, n_columns) matrix.
+        """
+        return np.array(
+            [[live_features.get(key, default) for key, default in (RECOMMENDER_FEATURES[col] for col in self._recommender_columns)]],
+            dtype=float,
+        )
+
+    @staticmethod
+    def _standardize(scaler, matrix):
+        # StandardScaler.transform without its input validation, which costs more than the
+        # arithmetic for the few rows of a single recommendation. Columns are in the order it was fitted on.
+        if scaler.mean_ is not None:
+            matrix = matrix - scaler.mean_
+        if scaler.scale_ is not None:
+            matrix = matrix / scaler.scale_
+        return matrix
+
+    @staticmethod
+    def _market_price(features):
+        if 'avg_modal_price' in features:
+            return features['avg_modal_price'].to_numpy(dtype=float)
+        return np.full(len(features), float(DEFAULT_MARKET_PRICE))
+
+    def _top_crops(self, environment, n=5):
+        """
+        Top N crops for each row of a recommender input matrix, as an (n_rows, n) array of labels, best first.
+        """
+        probabilities = self.crop_recommender.predict_proba(self._standardize(self.crop_scaler, environment))
+        top_n_indices = probabilities.argsort(axis=1)[:, -n:][:, ::-1]
+        return self.crop_recommender.classes_[top_n_indices]
 
     def _get_top_recommendations(self, live_features, n=5):
         """
         Gets the top N crop recommendations based on environmental factors.
         """
-        # Prepare features for the recommender model
-        recommender_features = pd.DataFrame({
-            'N': [live_features.get('topsoil_nitrogen', 100)], # Placeholder if Nitrogen not available
-            'P': [live_features.get('P_placeholder', 50)],
-            'K': [live_features.get('K_placeholder', 50)],
-            'temperature': [live_features.get('avg_temp_celsius')],
-            'humidity': [live_features.get('avg_humidity_percent')],
-            'ph': [live_features.get('topsoil_phh2o')],
-            'rainfall': [live_features.get('total_rainfall_mm')]
-        })
-        
-        # Scale the features
-        recommender_features_scaled = self.crop_scaler.transform(recommender_features)
-        
-        # Get probabilities for each crop
-        probabilities = self.crop_recommender.predict_proba(recommender_features_scaled)
-        
-        # Get the top N recommendations
-        top_n_indices = probabilities.argsort()[0][-n:][::-1]
-        top_n_crops = self.crop_recommender.classes_[top_n_indices]
-        
-        return top_n_crops
+        return self._top_crops(self._recommender_row(live_features), n)[0]
+
+    def _get_top_recommendations_batch(self, features, n=5):
+        """
+        Gets the top N crops for every row of `features` with a single model call.
+        Returns an (n_rows, n) array of crop labels, best first.
+        """
+        return self._top_crops(self._recommender_matrix(features), n)
+
+    def get_batch_recommendations(self, features, n=5):
+        """
+        Vectorized core of `get_final_recommendations` for a DataFrame of scenarios.
+
+        Both models are evaluated once over the whole scenario x crop matrix. Returns a
+        dict of (n_rows, n) arrays: 'crop', 'predicted_yield', 'sustainability' and 'profit',
+        with crops in recommender order.
+        """
+        environment = self._recommender_matrix(features)
+        return self._score_crops(self._top_crops(environment, n), environment, self._market_price(features))
+
+    def _score_crops(self, top_crops, environment, market_price):
+        """
+        Predicted yield, sustainability and profit for each row's `top_crops`, given the
+        rows' recommender inputs and market prices. Returns the dict `get_batch_recommendations` does.
+        """
+        n_rows, n_crops = top_crops.shape
+        crops = top_crops.ravel()
+
+        # 1. Prepare features for the yield model: one row per (scenario, crop)
+        cost = np.array([self.cost_of_cultivation.get(crop, 0) for crop in crops], dtype=float)
+        market_price_per_quintal = np.repeat(market_price, n_crops)
+        encoded = np.zeros((n_rows * n_crops, len(self._yield_columns)))
+        column_index = {col: i for i, col in enumerate(self._yield_columns)}
+        # The yield model shares the recommender's environmental columns, plus per-crop cost and price
+        for i, col in enumerate(self._recommender_columns):
+            if col in column_index:
+                encoded[:, column_index[col]] = np.repeat(environment[:, i], n_crops)
+        for col, values in (('Cost_of_Cultivation_C2', cost), ('Modal_Price_Rs_per_Quintal', market_price_per_quintal)):
+            if col in column_index:
+                encoded[:, column_index[col]] = values
+        for row, crop in enumerate(crops):
+            i = column_index.get(f'label_{crop}')
+            if i is not None:
+                encoded[row, i] = 1
+
+        # 2. Scale and Predict Yield
+        predicted_yield = self.yield_forecaster.predict(self._standardize(self.yield_scaler, encoded))
+
+        # 3. Look up other metrics
+        sustainability = self.sustainability_scores['sustainability_score'].reindex(crops).to_numpy()
+
+        # 4. Calculate Profit
+        profit_margin = predicted_yield * market_price_per_quintal - cost
+
+        shape = (n_rows, n_crops)
+        return {
+            'crop': top_crops,
+            'predicted_yield': predicted_yield.reshape(shape),
+            'sustainability': sustainability.reshape(shape),
+            'profit': profit_margin.reshape(shape),
+        }
 
     def get_final_recommendations(self, live_features):
         """
         Generates final ranked recommendations with yield, profit, and sustainability.
         """
-        top_crops = self._get_top_recommendations(live_features)
-        
-        final_results = []
-        
-        market_price_per_quintal = live_features.get('avg_modal_price', 2500)
-
-        for crop in top_crops:
-            # 1. Prepare features for the yield model
-            encoded_df = pd.DataFrame(columns=self.yield_model_columns)
-            encoded_df.loc[0] = 0
-            
-            crop_column_name = f'label_{crop}'
-            if crop_column_name in encoded_df.columns:
-                encoded_df[crop_column_name] = 1
+        environment = self._recommender_row(live_features)
+        market_price = np.array([live_features.get('avg_modal_price', DEFAULT_MARKET_PRICE)], dtype=float)
+        results = self._score_crops(self._top_crops(environment), environment, market_price)
 
-            for col in encoded_df.columns:
-                if col in live_features:
-                    encoded_df.loc[0, col] = live_features[col]
-            
-            # 2. Scale and Predict Yield
-            yield_features_scaled = self.yield_scaler.transform(encoded_df)
-            predicted_yield = self.yield_forecaster.predict(yield_features_scaled)[0]
-            
-            # 3. Look up other metrics
-            sustainability = self.sustainability_scores.loc[crop, 'sustainability_score']
-            cost = self.cost_of_cultivation.get(crop, 0)
-            
-            # 4. Calculate Profit
-            gross_revenue = predicted_yield * market_price_per_quintal
-            profit_margin = gross_revenue - cost
-            
+        final_results = []
+        for crop, predicted_yield, sustainability, profit_margin in zip(
+            results['crop'][0], results['predicted_yield'][0], results['sustainability'][0], results['profit'][0]
+        ):
             final_results.append({
                 'crop': crop.capitalize(),
                 'predicted_yield_quintal_per_hectare': round(predicted_yield, 2),
@@ -90,5 +183,28 @@ class PredictionService:
             
         return final_results
 
+# Perturbation columns added by `expand_scenarios`, named after the ScenarioGrid fields
+SCENARIO_COLUMNS = ('rainfall_pct', 'temperature_delta', 'humidity_pct', 'price_pct')
+
+
+def expand_scenarios(live_features, rainfall_pct, temperature_delta, humidity_pct, price_pct):
+    """
+    Builds one row of 'live_features' per combination of the given perturbations.
+    Percentages scale the base value (-20 means 20% lower); temperature deltas are in °C.
+    """
+    grid = np.meshgrid(rainfall_pct, temperature_delta, humidity_pct, price_pct, indexing='ij')
+    rain, temp, humidity, price = (np.asarray(axis, dtype=float).ravel() for axis in grid)
+
+    scenarios = pd.DataFrame({key: [value] * len(rain) for key, value in live_features.items()})
+    scenarios['total_rainfall_mm'] = np.clip(live_features['total_rainfall_mm'] * (1 + rain / 100), 0, None)
+    scenarios['avg_temp_celsius'] = live_features['avg_temp_celsius'] + temp
+    scenarios['avg_humidity_percent'] = np.clip(live_features['avg_humidity_percent'] * (1 + humidity / 100), 0, 100)
+    scenarios['avg_modal_price'] = live_features.get('avg_modal_price', DEFAULT_MARKET_PRICE) * (1 + price / 100)
+    scenarios['rainfall_pct'] = rain
+    scenarios['temperature_delta'] = temp
+    scenarios['humidity_pct'] = humidity
+    scenarios['price_pct'] = price
+    return scenarios
+
 # Create a single, reusable instance of the service that gets loaded on startup
 prediction_service = PredictionService()
\ No newline at end of file
@@ -0,0 +1,306 @@
+import asyncio
+import contextlib
+import threading
+import time
+from collections import deque
+
+from app.core.metrics import metrics
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+metrics.describe("circuit_breaker_state", "Current breaker state (0=closed, 1=open, 2=half_open).")
+metrics.describe("circuit_breaker_transitions_total", "Breaker state transitions.")
+metrics.describe("circuit_breaker_calls_total", "Upstream calls seen by the breaker, by outcome.")
+metrics.describe("upstream_stale_served_total", "Responses served from the last good value instead of the upstream.")
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_rate_threshold: float = 0.5,
+        slow_call_duration: float = 5.0,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_duration: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock=time.monotonic,
+    ):
+        """
+        Tracks the outcome of the last `window_size` calls to one upstream.
+
+        The breaker opens when, over at least `min_calls` calls, the share of failures
+        or of calls slower than `slow_call_duration` seconds reaches its threshold.
+        While open, calls fail fast. After `open_duration` seconds it lets
+        `half_open_max_calls` probes through: if they all succeed it closes again,
+        otherwise it reopens.
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)  # (failed, slow) per call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        metrics.set("circuit_breaker_state", _STATE_VALUES[CLOSED], upstream=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return True
+            metrics.inc("circuit_breaker_calls_total", upstream=self.name, outcome="rejected")
+            return False
+
+    def record_success(self, elapsed: float):
+        slow = elapsed >= self.slow_call_duration
+        metrics.inc("circuit_breaker_calls_total", upstream=self.name, outcome="slow" if slow else "success")
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_max_calls:
+                    self._transition(CLOSED)
+                return
+            self._window.append((False, slow))
+            self._evaluate()
+
+    def record_failure(self):
+        metrics.inc("circuit_breaker_calls_total", upstream=self.name, outcome="failure")
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._transition(OPEN)
+                return
+            self._window.append((True, False))
+            self._evaluate()
+
+    async def call(self, func, *args, **kwargs):
+        """
+        Runs `await func(*args, **kwargs)` through the breaker. Any exception counts
+        as a failure and is re-raised; rejected calls raise CircuitOpenError. A cancelled
+        call counts as neither, but gives back its half-open probe slot.
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit for {self.name} is open")
+        start = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release_probe()
+            raise
+        self.record_success(time.perf_counter() - start)
+        return result
+
+    def release_probe(self):
+        """Gives back a half-open probe slot taken by `allow_request` without recording an outcome."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _evaluate(self):
+        if self._state != CLOSED or len(self._window) < self.min_calls:
+            return
+        calls = len(self._window)
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow = sum(1 for _, is_slow in self._window if is_slow)
+        if failures / calls >= self.failure_rate_threshold or slow / calls >= self.slow_call_rate_threshold:
+            self._transition(OPEN)
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_duration:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, new_state):
+        old_state, self._state = self._state, new_state
+        if new_state == OPEN:
+            self._opened_at = self._clock()
+        if new_state == HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if new_state == CLOSED:
+            self._window.clear()
+        metrics.set("circuit_breaker_state", _STATE_VALUES[new_state], upstream=self.name)
+        metrics.inc("circuit_breaker_transitions_total", upstream=self.name, from_state=old_state, to_state=new_state)
+        print(f"Circuit breaker '{self.name}': {old_state} -> {new_state}")
+
+
+# Keeps references to background refreshes so they are not garbage collected mid-flight
+_background_tasks = set()
+_refreshing = set()
+
+
+async def stale_while_revalidate(cache, key, fetch, fresh_for: float, serve_stale_for: float, name: str):
+    """
+    Returns a cached value when one exists, refreshing it through `fetch` as needed.
+
+    - Younger than `fresh_for` seconds: served as is.
+    - Younger than `serve_stale_for` seconds: served immediately while `fetch` refreshes it in the background.
+    - Older, or missing: `fetch` is awaited; if it fails, the last good value (if any) is served instead.
+
+    `cache` is a TieredCache, whose `fill` makes sure only one caller per key (across
+    workers) hits the upstream at a time. `fetch` is a coroutine function returning the
+    new value or None on failure. Returns None only when the upstream failed and nothing was cached.
+    """
+    entry = await cache.get_entry(key)
+    if entry is not None:
+        value, age = entry
+        if age < fresh_for:
+            return value
+        if age < serve_stale_for:
+            _refresh_in_background(cache, key, fetch, name)
+            metrics.inc("upstream_stale_served_total", upstream=name, reason="revalidating")
+            return value
+
+    fresh_value = await cache.fill(key, fetch)
+    if fresh_value is not None:
+        return fresh_value
+    if entry is not None:
+        metrics.inc("upstream_stale_served_total", upstream=name, reason="upstream_failed")
+        return entry[0]
+    return None
+
+
+def _refresh_in_background(cache, key, fetch, name):
+    if (name, key) in _refreshing:
+        return
+    _refreshing.add((name, key))
+
+    async def refresh():
+        try:
+            await cache.fill(key, fetch)
+        finally:
+            _refreshing.discard((name, key))
+
+    task = asyncio.get_running_loop().create_task(refresh())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+metrics.describe("concurrency_limiter_rejections_total", "Requests rejected by a concurrency limiter, by reason.")
+metrics.describe("concurrency_limiter_admitted_total", "Requests admitted by a concurrency limiter.")
+metrics.describe("concurrency_limiter_in_flight", "Requests currently holding a concurrency limiter slot.")
+metrics.describe("concurrency_limiter_waiting", "Requests queued for a concurrency limiter slot.")
+
+_LIMIT_MESSAGES = {
+    "per_key": "Too many concurrent requests",
+    "rate": "Rate limit exceeded",
+    "global": "Service is busy",
+}
+
+
+class LimitExceeded(Exception):
+    def __init__(self, scope: str, retry_after: int):
+        """
+        `scope` is "per_key" when the caller itself has too many requests in flight, "rate" when
+        it has used up its request budget, or "global" when the whole service is saturated.
+        """
+        super().__init__(_LIMIT_MESSAGES[scope])
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    def __init__(
+        self, name: str, max_concurrent: int, max_per_key: int | None = None, max_wait: float = 5.0,
+        max_queue: int | None = None,
+    ):
+        """
+        Bounds in-flight calls globally and, optionally, per key (e.g. per user).
+
+        A key already at `max_per_key` is rejected immediately. Otherwise the caller
+        waits up to `max_wait` seconds for one of the `max_concurrent` global slots,
+        unless `max_queue` callers are already waiting, in which case it is shed at once.
+        """
+        self.name = name
+        self.max_per_key = max_per_key
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._per_key = {}
+        self._in_flight = 0
+        self._waiting = 0
+
+    async def acquire(self, key=None):
+        """
+        Takes a slot for `key` or raises LimitExceeded. Pair every successful call with `release(key)`.
+        """
+        if self.max_per_key is not None:
+            if self._per_key.get(key, 0) >= self.max_per_key:
+                metrics.inc("concurrency_limiter_rejections_total", limiter=self.name, reason="per_key")
+                raise LimitExceeded("per_key", retry_after=1)
+            self._per_key[key] = self._per_key.get(key, 0) + 1
+        if self.max_queue is not None and self._waiting >= self.max_queue and self._semaphore.locked():
+            self._drop_key(key)
+            metrics.inc("concurrency_limiter_rejections_total", limiter=self.name, reason="queue_full")
+            raise LimitExceeded("global", retry_after=1)
+
+        self._waiting += 1
+        metrics.set("concurrency_limiter_waiting", self._waiting, limiter=self.name)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._drop_key(key)
+            metrics.inc("concurrency_limiter_rejections_total", limiter=self.name, reason="global")
+            raise LimitExceeded("global", retry_after=int(self.max_wait) or 1)
+        except BaseException:
+            self._drop_key(key)
+            raise
+        finally:
+            self._waiting -= 1
+            metrics.set("concurrency_limiter_waiting", self._waiting, limiter=self.name)
+        self._in_flight += 1
+        metrics.inc("concurrency_limiter_admitted_total", limiter=self.name)
+        metrics.set("concurrency_limiter_in_flight", self._in_flight, limiter=self.name)
+
+    def release(self, key=None):
+        self._semaphore.release()
+        self._drop_key(key)
+        self._in_flight -= 1
+        metrics.set("concurrency_limiter_in_flight", self._in_flight, limiter=self.name)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, key=None):
+        """`async with limiter.slot(key):` runs the block holding a slot."""
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def _drop_key(self, key):
+        if self.max_per_key is None:
+            return
+        remaining = self._per_key.get(key, 0) - 1
+        if remaining > 0:
+            self._per_key[key] = remaining
+        else:
+            self._per_key.pop(key, None)
@@ -0,0 +1,179 @@
+"""
+Shared plumbing for the benchmarks: an isolated database, a fake
+SoilGrids/OpenWeatherMap server on a local port, and seed data.
+
+Settings are read when the app is first imported, so `configure()` must run
+before anything under `app` is imported.
+"""
+import contextlib
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import httpx
+
+SEED_PASSWORD = "benchmark-password"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configure(database_url: str, upstream_url: str, cache_backend: str = "memory"):
+    """
+    Points the app at the benchmark database and the fake upstreams. The shared cache
+    tier is off by default so runs don't see each other's entries; pass "sqlite" to
+    use a file next to the benchmark database, or "redis" with CACHE_REDIS_URL set.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["CACHE_BACKEND"] = cache_backend
+    # Measure the app, not the per-user and per-IP budgets (admission caps stay as configured)
+    for name in ("RATE_LIMIT_PER_MINUTE", "RATE_LIMIT_BURST", "LOGIN_RATE_LIMIT_PER_MINUTE", "LOGIN_RATE_LIMIT_BURST"):
+        os.environ[name] = "1000000"
+    if database_url.startswith("sqlite:///"):
+        os.environ["CACHE_SQLITE_PATH"] = os.path.join(os.path.dirname(database_url[len("sqlite:///"):]), "cache.db")
+    os.environ["SOILGRIDS_BASE_URL"] = upstream_url
+    os.environ["OPENWEATHER_BASE_URL"] = upstream_url
+    os.environ["OPENWEATHER_API_KEY"] = "benchmark"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeUpstreamServer:
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0):
+        """
+        Runs scripts/fake_upstream.py under uvicorn in a background thread, so upstream
+        latency is real network I/O from the app's point of view.
+        """
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.latency = latency
+        self.error_rate = error_rate
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        import uvicorn
+        from scripts.fake_upstream import app as fake_app
+
+        config = uvicorn.Config(fake_app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake upstream server did not start")
+            time.sleep(0.05)
+        self.set_fault(latency=self.latency, error_rate=self.error_rate)
+        return self
+
+    def set_fault(self, **fault):
+        httpx.post(f"{self.url}/_control", json=fault).raise_for_status()
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def migrate_database():
+    """Builds the schema the way deployments do, with `alembic upgrade head`."""
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config(os.path.join(REPO_ROOT, "alembic.ini")), "head")
+
+
+@contextlib.contextmanager
+def temporary_database():
+    with tempfile.TemporaryDirectory(prefix="agri-bench-") as tmp:
+        yield f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+
+def seed_database(n_users: int, farms_per_user: int, seed: int = 42) -> list[dict]:
+    """
+    Migrates the schema and inserts users, farms and soil data in bulk.
+    Farms are scattered over Maharashtra so weather lookups are spread across many cache cells.
+    Returns [{"email", "password", "farm_ids"}] for the load generator.
+    """
+    import random
+
+    from sqlalchemy import insert
+
+    from app.core.security import get_password_hash
+    from app.db import models
+    from app.db.database import SessionLocal
+
+    migrate_database()
+    rng = random.Random(seed)
+    # One hash for everyone: seeding should not spend minutes in bcrypt
+    hashed_password = get_password_hash(SEED_PASSWORD)
+
+    db = SessionLocal()
+    try:
+        user_ids = db.scalars(
+            insert(models.User).returning(models.User.id, sort_by_parameter_order=True),
+            [{"email": f"user{i}@bench.local", "hashed_password": hashed_password} for i in range(n_users)],
+        ).all()
+        farm_rows = [
+            {
+                "name": f"farm-{user_id}-{j}",
+                "latitude": rng.uniform(16.0, 21.5),
+                "longitude": rng.uniform(73.0, 80.5),
+                "owner_id": user_id,
+            }
+            for user_id in user_ids
+            for j in range(farms_per_user)
+        ]
+        farm_ids = db.scalars(
+            insert(models.Farm).returning(models.Farm.id, sort_by_parameter_order=True), farm_rows
+        ).all() if farm_rows else []
+        if farm_ids:
+            db.execute(
+                insert(models.SoilData),
+                [
+                    {
+                        "farm_id": farm_id,
+                        "ph": rng.uniform(5.5, 8.0),
+                        "organic_carbon": rng.uniform(4, 15),
+                        "sand": rng.uniform(200, 600),
+                        "silt": rng.uniform(150, 400),
+                        "clay": rng.uniform(100, 450),
+                    }
+                    for farm_id in farm_ids
+                ],
+            )
+        db.commit()
+    finally:
+        db.close()
+
+    farms_by_user = {}
+    for row, farm_id in zip(farm_rows, farm_ids):
+        farms_by_user.setdefault(row["owner_id"], []).append(farm_id)
+    return [
+        {"email": f"user{i}@bench.local", "password": SEED_PASSWORD, "farm_ids": farms_by_user.get(user_id, [])}
+        for i, user_id in enumerate(user_ids)
+    ]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+    """Throughput and latency percentiles (milliseconds) for one benchmark run."""
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "requests": len(ordered) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else None,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+    }
@@ -0,0 +1,90 @@
+"""
+In-process load generator: drives the FastAPI app through httpx's ASGI transport
+(no sockets between client and app) while the app talks to the fake upstreams
+over real HTTP.
+"""
+import asyncio
+import itertools
+import random
+import time
+
+import httpx
+
+from benchmarks.harness import summarize
+
+
+def _scenarios(users: list[dict], tokens: dict, weather_source: str):
+    """Request factories per endpoint: each call returns (method, url, kwargs)."""
+    rng = random.Random(11)
+    with_farms = [user for user in users if user["farm_ids"]]
+
+    def login():
+        user = rng.choice(users)
+        return "POST", "/api/auth/login", {"data": {"username": user["email"], "password": user["password"]}}
+
+    def list_farms():
+        user = rng.choice(users)
+        return "GET", "/api/farms/", {"headers": {"Authorization": f"Bearer {tokens[user['email']]}"}}
+
+    def recommendation():
+        user = rng.choice(with_farms)
+        farm_id = rng.choice(user["farm_ids"])
+        return "GET", f"/api/recommendations/{farm_id}", {
+            "params": {"weather_source": weather_source},
+            "headers": {"Authorization": f"Bearer {tokens[user['email']]}"},
+        }
+
+    return {"login": login, "list_farms": list_farms, "recommendation": recommendation}
+
+
+async def _drive(client: httpx.AsyncClient, make_request, concurrency: int, total: int) -> dict:
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while next(counter) < total:
+            method, url, kwargs = make_request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def run(
+    users: list[dict],
+    concurrency_levels: list[int],
+    requests_per_level: int,
+    login_requests_per_level: int,
+    weather_source: str = "live",
+) -> dict:
+    from app.core.security import create_access_token
+    from app.main import app
+
+    # Tokens are minted directly so only the login scenario pays for bcrypt
+    tokens = {user["email"]: create_access_token({"sub": user["email"]}) for user in users}
+    scenarios = _scenarios(users, tokens, weather_source)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request in scenarios.items():
+            total = login_requests_per_level if name == "login" else requests_per_level
+            # Warm caches and lazy imports so the first level is not penalised
+            await _drive(client, make_request, concurrency=1, total=min(5, total))
+            results[name] = {
+                f"c{concurrency}": await _drive(client, make_request, concurrency, total)
+                for concurrency in concurrency_levels
+            }
+    return results
@@ -0,0 +1,56 @@
+"""
+Micro-benchmarks for the recommendation hot path: the crop recommender, the
+full ranking with yield/profit, and the weather aggregation step.
+"""
+import random
+import time
+
+from benchmarks.harness import summarize
+
+
+def _sample_features(rng: random.Random) -> dict:
+    return {
+        "topsoil_phh2o": rng.uniform(5.5, 8.0),
+        "avg_temp_celsius": rng.uniform(15, 38),
+        "avg_humidity_percent": rng.uniform(30, 95),
+        "total_rainfall_mm": rng.uniform(0, 250),
+        "topsoil_nitrogen": 95,
+        "P_placeholder": 55,
+        "K_placeholder": 45,
+    }
+
+
+def _sample_forecast(rng: random.Random) -> dict:
+    return {
+        "daily": [
+            {"temp": {"day": rng.uniform(15, 38)}, "humidity": rng.uniform(30, 95), "rain": rng.uniform(0, 30)}
+            for _ in range(8)
+        ]
+    }
+
+
+def _time_calls(func, inputs, warmup: int = 5) -> dict:
+    for item in inputs[:warmup]:
+        func(item)
+    latencies = []
+    start = time.perf_counter()
+    for item in inputs:
+        call_start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def run(iterations: int = 200, seed: int = 7) -> dict:
+    from app.services.data_ingestion import summarize_weather
+    from app.services.ml_service import prediction_service
+
+    rng = random.Random(seed)
+    features = [_sample_features(rng) for _ in range(iterations)]
+    forecasts = [_sample_forecast(rng) for _ in range(iterations)]
+
+    return {
+        "get_top_recommendations": _time_calls(prediction_service._get_top_recommendations, features),
+        "get_final_recommendations": _time_calls(prediction_service.get_final_recommendations, features),
+        "summarize_weather": _time_calls(summarize_weather, forecasts),
+    }
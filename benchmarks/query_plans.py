@@ -0,0 +1,190 @@
+"""
+Query-plan regression check: drives every router flow against a seeded
+database, captures each SQL statement the ORM issues, and asks the database
+how it would run them. Any full table scan fails the check.
+
+    python -m benchmarks.query_plans                       # throwaway SQLite database
+    python -m benchmarks.query_plans --database-url postgresql://.../empty_db
+
+SQLite plans come from EXPLAIN QUERY PLAN, Postgres plans from EXPLAIN (FORMAT JSON).
+Statistics are refreshed (ANALYZE) after seeding so the planner sees realistic
+table sizes. Exits with status 1 if any statement scans a whole table.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+
+import httpx
+
+from benchmarks.harness import FakeUpstreamServer, configure, seed_database, temporary_database
+
+# (flow, table) pairs that are allowed to scan, e.g. a deliberately unfiltered admin export
+ALLOWED_SCANS = set()
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+async def _drive_flows(user: dict, farm_id: int, capture) -> None:
+    from app.core.security import create_access_token
+    from app.db.database import SessionLocal
+    from app.main import app
+    from app.services.market_data_job import fetch_and_store_market_data
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user['email']})}"}
+    csv_upload = "name,latitude,longitude\nplan-a,19.99,73.78\nplan-b,20.01,73.80\n"
+
+    flows = [
+        ("login", "POST", "/api/auth/login", {"data": {"username": user["email"], "password": user["password"]}}),
+        ("list_farms", "GET", "/api/farms/", {"headers": headers}),
+        ("create_farm", "POST", "/api/farms/", {"headers": headers, "json": {"name": "plan", "latitude": 19.9, "longitude": 73.7}}),
+        ("bulk_import", "POST", "/api/farms/bulk", {"headers": headers, "files": {"file": ("farms.csv", csv_upload, "text/csv")}}),
+        ("recommendation", "GET", f"/api/recommendations/{farm_id}", {"headers": headers}),
+        ("scenarios", "POST", f"/api/recommendations/{farm_id}/scenarios", {"headers": headers, "json": {"price_pct": [-20, 0]}}),
+        ("save_recommendation", "POST", "/api/recommendations/save", {"headers": headers, "json": {"farm_id": farm_id, "recommendation_text": [{"crop": "Maize"}]}}),
+        ("history", "GET", f"/api/recommendations/history/{user['id']}", {"headers": headers}),
+        ("farms_nearby", "GET", "/api/regions/farms/nearby", {"headers": headers, "params": {"latitude": 19.0, "longitude": 75.0, "radius_km": 25}}),
+        ("farms_within", "GET", "/api/regions/farms/within", {"headers": headers, "params": {"min_latitude": 18.5, "min_longitude": 74.5, "max_latitude": 19.5, "max_longitude": 75.5}}),
+        ("region_summary", "GET", "/api/regions/te/summary", {"headers": headers, "params": {"precision": 4}}),
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://plans") as client:
+        for flow, method, url, kwargs in flows:
+            capture.flow = flow
+            response = await client.request(method, url, **kwargs)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{flow}: {method} {url} returned {response.status_code}: {response.text}")
+
+    # Not a router, but the scheduled job issues ORM queries against the same tables
+    capture.flow = "market_data_job"
+    db = SessionLocal()
+    try:
+        fetch_and_store_market_data(db)
+    finally:
+        db.close()
+
+
+class _StatementCapture:
+    def __init__(self):
+        self.flow = None
+        self.statements = {}  # (flow, statement) -> parameters of its first execution
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.flow is None or not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            return
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        self.statements.setdefault((self.flow, statement), parameters)
+
+
+def _seed_history(farm_ids: list[int], per_farm: int = 2, markets: int = 200):
+    from sqlalchemy import insert
+
+    from app.db import models
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        db.execute(
+            insert(models.Recommendation),
+            [{"farm_id": farm_id, "recommendation_text": "[]"} for farm_id in farm_ids for _ in range(per_farm)],
+        )
+        db.execute(
+            insert(models.MarketData),
+            [{"crop_name": crop, "market_name": f"Market {i}", "price": 2000.0} for i in range(markets) for crop in ("Wheat", "Onion")],
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _analyze(engine):
+    raw = engine.raw_connection()
+    try:
+        raw.cursor().execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _explain(engine, statement: str, parameters) -> list[str]:
+    """Returns the tables the plan reads with a full scan."""
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if engine.dialect.name == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            details = [row[3] for row in cursor.fetchall()]
+            return [match.group(1) for match in map(_SQLITE_SCAN.match, details) if match and match.group(1) != "CONSTANT"]
+
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = cursor.fetchone()[0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        scans = []
+
+        def walk(node):
+            if node.get("Node Type") == "Seq Scan":
+                scans.append(node.get("Relation Name"))
+            for child in node.get("Plans", []):
+                walk(child)
+
+        walk(plan[0]["Plan"])
+        return scans
+    finally:
+        raw.rollback()
+        raw.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Empty database to migrate and seed (default: throwaway SQLite)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--farms-per-user", type=int, default=25)
+    args = parser.parse_args(argv)
+
+    with temporary_database() as temp_url, FakeUpstreamServer() as upstream:
+        configure(args.database_url or temp_url, upstream.url)
+        # The seeded user doubles as a district officer for the regional endpoints
+        os.environ["OFFICER_EMAILS"] = json.dumps(["user0@bench.local"])
+        users = seed_database(args.users, args.farms_per_user)
+
+        from sqlalchemy import event
+
+        from app.db import models
+        from app.db.database import SessionLocal, engine
+
+        db = SessionLocal()
+        try:
+            user = dict(users[0], id=db.query(models.User.id).filter(models.User.email == users[0]["email"]).scalar())
+        finally:
+            db.close()
+        _seed_history([farm_id for seeded in users for farm_id in seeded["farm_ids"]])
+        _analyze(engine)
+
+        capture = _StatementCapture()
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            asyncio.run(_drive_flows(user, user["farm_ids"][0], capture))
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        failures = []
+        for (flow, statement), parameters in capture.statements.items():
+            for table in _explain(engine, statement, parameters):
+                if (flow, table) not in ALLOWED_SCANS:
+                    failures.append((flow, table, statement))
+
+    print(f"Checked {len(capture.statements)} statements across {len({flow for flow, _ in capture.statements})} flows.")
+    if failures:
+        print("\nFull table scans:")
+        for flow, table, statement in failures:
+            print(f"  - [{flow}] {table}: {' '.join(statement.split())}")
+        return 1
+    print("No full table scans.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
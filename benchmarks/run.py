@@ -0,0 +1,159 @@
+"""
+Runs the micro-benchmarks and the load sweep, saves the results as JSON and
+flags regressions against a stored baseline.
+
+    python -m benchmarks.run                          # compare with benchmarks/baseline.json
+    python -m benchmarks.run --upstream-latency 0.2   # slower fake upstreams
+    python -m benchmarks.run --update-baseline        # accept the current numbers
+
+Exits with status 1 when any p95 latency or throughput is worse than the
+baseline by more than --tolerance. Baselines are only comparable on the same
+machine, Python and parameters: when any of them differs the run is not gated
+and exits with status 2, so regenerate the baseline when they change.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import sys
+
+from benchmarks import load, micro
+from benchmarks.harness import FakeUpstreamServer, configure, seed_database, temporary_database
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "results", "latest.json")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Returns a description of every metric that regressed beyond `tolerance`."""
+    regressions = []
+
+    def walk(current, reference, path):
+        if "p95_ms" in current:
+            label = "/".join(path)
+            if current["p95_ms"] and reference.get("p95_ms") and current["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{label}: p95 {reference['p95_ms']} ms -> {current['p95_ms']} ms")
+            if (
+                current["throughput_rps"] is not None and reference.get("throughput_rps")
+                and current["throughput_rps"] < reference["throughput_rps"] * (1 - tolerance)
+            ):
+                regressions.append(f"{label}: throughput {reference['throughput_rps']} -> {current['throughput_rps']} req/s")
+            if current["errors"] > reference.get("errors", 0):
+                regressions.append(f"{label}: errors {reference.get('errors', 0)} -> {current['errors']}")
+            return
+        for key, value in current.items():
+            if isinstance(value, dict) and isinstance(reference.get(key), dict):
+                walk(value, reference[key], path + [key])
+
+    walk(results["benchmarks"], baseline.get("benchmarks", {}), [])
+    return regressions
+
+
+def incomparable(results: dict, baseline: dict) -> list[str]:
+    """Returns why `results` can't be compared with `baseline`, or an empty list if they can."""
+    reasons = []
+    for key in ("machine", "python"):
+        if results[key] != baseline.get(key):
+            reasons.append(f"{key}: baseline {baseline.get(key)!r}, this run {results[key]!r}")
+    # The tolerance only affects the comparison, not the measurements
+    current = {key: value for key, value in results["parameters"].items() if key != "tolerance"}
+    reference = {key: value for key, value in baseline.get("parameters", {}).items() if key != "tolerance"}
+    for key in sorted(current.keys() | reference.keys()):
+        if current.get(key) != reference.get(key):
+            reasons.append(f"--{key.replace('_', '-')}: baseline {reference.get(key)!r}, this run {current.get(key)!r}")
+    return reasons
+
+
+def print_table(benchmarks: dict):
+    print(f"{'benchmark':<48}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+
+    def walk(node, path):
+        if "p95_ms" in node:
+            print(
+                f"{'/'.join(path):<48}{node['throughput_rps']!s:>10}{node['p50_ms']!s:>10}"
+                f"{node['p95_ms']!s:>10}{node['p99_ms']!s:>10}{node['errors']:>8}"
+            )
+            return
+        for key, value in node.items():
+            walk(value, path + [key])
+
+    walk(benchmarks, [])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--farms-per-user", type=int, default=4)
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--login-requests", type=int, default=30, help="Login requests per level (bcrypt is slow on purpose)")
+    parser.add_argument("--micro-iterations", type=int, default=200)
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds added to every fake upstream call")
+    parser.add_argument("--weather-source", default="live", choices=["live", "climatology", "auto"])
+    parser.add_argument("--cache-backend", default="memory", choices=["memory", "sqlite", "redis"])
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before flagging")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    parameters = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "update_baseline")}
+
+    with temporary_database() as database_url, FakeUpstreamServer(latency=args.upstream_latency) as upstream:
+        configure(database_url, upstream.url, args.cache_backend)
+        benchmarks = {"micro": micro.run(iterations=args.micro_iterations)}
+        if not args.skip_load:
+            users = seed_database(args.users, args.farms_per_user)
+            benchmarks["load"] = asyncio.run(
+                load.run(users, concurrency_levels, args.requests, args.login_requests, args.weather_source)
+            )
+
+    results = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "parameters": parameters,
+        "benchmarks": benchmarks,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_table(benchmarks)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --update-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    mismatches = incomparable(results, baseline)
+    if mismatches:
+        print(f"\nNot comparable with {args.baseline}, so no regression check was made:")
+        for mismatch in mismatches:
+            print(f"  - {mismatch}")
+        print("Rerun with the baseline's parameters on its machine, or record a new one with --update-baseline.")
+        return 2
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressions beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
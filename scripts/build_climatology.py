@@ -0,0 +1,123 @@
+"""
+Builds the climatology grid read by app/services/climatology.py (the offline
+weather source behind weather_source=climatology and the "auto" fallback).
+
+Data source: NASA POWER (https://power.larc.nasa.gov), climatology endpoint,
+agroclimatology community. For every grid cell centre it fetches the long-term
+monthly means of
+
+    T2M          air temperature at 2 m (°C)
+    RH2M         relative humidity at 2 m (%)
+    PRECTOTCORR  bias-corrected precipitation (mm/day, converted to monthly totals)
+
+POWER data is free to use; cite "NASA Langley Research Center (LaRC) POWER
+Project" when redistributing the grid. The default box covers Maharashtra, the
+region the service and its benchmarks target, at POWER's native 0.5° resolution:
+
+    python -m scripts.build_climatology
+    python -m scripts.build_climatology --bbox 8,68,37,97.5 --resolution 1.0  # all of India
+
+The grid is written to CLIMATOLOGY_PATH (models/climatology.npy plus a .json
+sidecar). Cells POWER has no data for are stored as NaN and skipped at lookup.
+"""
+import argparse
+import asyncio
+import calendar
+import math
+
+import httpx
+import numpy as np
+
+from app.core.config import settings
+from app.services.climatology import CLIMATOLOGY_VARIABLES, ClimatologyGrid
+
+POWER_URL = "https://power.larc.nasa.gov/api/temporal/climatology/point"
+# POWER parameter for each grid variable, in CLIMATOLOGY_VARIABLES order
+POWER_PARAMETERS = {
+    "avg_temp_celsius": "T2M",
+    "avg_humidity_percent": "RH2M",
+    "total_rainfall_mm": "PRECTOTCORR",
+}
+MONTHS = [calendar.month_abbr[month].upper() for month in range(1, 13)]
+# Lat/lon box of Maharashtra
+DEFAULT_BBOX = (15.5, 72.5, 22.5, 81.0)
+
+
+def parse_cell(payload: dict) -> np.ndarray:
+    """
+    Converts one POWER climatology response to a (12, n_variables) array of monthly normals.
+    """
+    parameters = payload["properties"]["parameter"]
+    fill_value = payload.get("header", {}).get("fill_value", -999.0)
+    cell = np.full((12, len(CLIMATOLOGY_VARIABLES)), np.nan, dtype=np.float32)
+    for k, variable in enumerate(CLIMATOLOGY_VARIABLES):
+        series = parameters.get(POWER_PARAMETERS[variable], {})
+        for m, month in enumerate(MONTHS):
+            value = series.get(month)
+            if value is None or value == fill_value:
+                continue
+            if variable == "total_rainfall_mm":
+                # mm/day -> monthly total
+                value *= calendar.monthrange(2001, m + 1)[1]
+            cell[m, k] = value
+    return cell
+
+
+async def fetch_cell(client, url: str, semaphore, latitude: float, longitude: float, retries: int = 3) -> np.ndarray:
+    params = {
+        "parameters": ",".join(POWER_PARAMETERS[variable] for variable in CLIMATOLOGY_VARIABLES),
+        "community": "AG",
+        "latitude": round(latitude, 4),
+        "longitude": round(longitude, 4),
+        "format": "JSON",
+    }
+    async with semaphore:
+        for attempt in range(retries):
+            try:
+                response = await client.get(url, params=params)
+                response.raise_for_status()
+                return parse_cell(response.json())
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                if attempt == retries - 1:
+                    print(f"Warning: no data for ({latitude:.2f}, {longitude:.2f}): {e}")
+                    return np.full((12, len(CLIMATOLOGY_VARIABLES)), np.nan, dtype=np.float32)
+                await asyncio.sleep(2 ** attempt)
+
+
+async def build(bbox, resolution: float, base_url: str, concurrency: int) -> tuple[np.ndarray, float, float]:
+    lat_min, lon_min, lat_max, lon_max = bbox
+    n_lat = math.ceil((lat_max - lat_min) / resolution)
+    n_lon = math.ceil((lon_max - lon_min) / resolution)
+    print(f"Fetching {n_lat * n_lon} cells ({n_lat}x{n_lon}) from {base_url}...")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        cells = await asyncio.gather(*(
+            fetch_cell(client, base_url, semaphore, lat_min + (i + 0.5) * resolution, lon_min + (j + 0.5) * resolution)
+            for i in range(n_lat)
+            for j in range(n_lon)
+        ))
+    data = np.stack(cells).reshape(n_lat, n_lon, 12, len(CLIMATOLOGY_VARIABLES))
+    return data, lat_min, lon_min
+
+
+def _bbox(value: str):
+    parts = tuple(float(part) for part in value.split(","))
+    if len(parts) != 4 or parts[0] >= parts[2] or parts[1] >= parts[3]:
+        raise argparse.ArgumentTypeError("expected lat_min,lon_min,lat_max,lon_max")
+    return parts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bbox", type=_bbox, default=DEFAULT_BBOX, help="lat_min,lon_min,lat_max,lon_max")
+    parser.add_argument("--resolution", type=float, default=0.5, help="Cell size in degrees")
+    parser.add_argument("--output", default=settings.CLIMATOLOGY_PATH)
+    parser.add_argument("--base-url", default=POWER_URL)
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight (POWER rate-limits clients)")
+    args = parser.parse_args()
+
+    data, lat_min, lon_min = asyncio.run(build(args.bbox, args.resolution, args.base_url, args.concurrency))
+    ClimatologyGrid.save(args.output, data, lat_min, lon_min, args.resolution)
+    missing = int(np.isnan(data[..., 0, 0]).sum())
+    print(f"Wrote {args.output} ({data.shape[0]}x{data.shape[1]} cells, {missing} without data).")
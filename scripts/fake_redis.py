@@ -0,0 +1,149 @@
+"""
+Local stand-in for a Redis server, implementing just enough of the protocol
+(RESP2) for the shared cache tier: PING, GET, SET with EX/PX/NX/XX, DEL,
+INCRBYFLOAT, PEXPIRE, EXISTS, SELECT, AUTH, FLUSHDB/FLUSHALL and DBSIZE.
+Data lives in memory only.
+
+Run it and point the API's workers at it:
+
+    python -m scripts.fake_redis --port 6390
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0 \\
+    uvicorn app.main:app --workers 4
+"""
+import argparse
+import asyncio
+import time
+
+# (db, key) -> (value, expires_at or None)
+_data = {}
+
+
+def _get(db, key):
+    entry = _data.get((db, key))
+    if entry is None:
+        return None
+    value, expires_at = entry
+    if expires_at is not None and expires_at <= time.monotonic():
+        del _data[(db, key)]
+        return None
+    return value
+
+
+def _encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, bool):
+        return b":%d\r\n" % reply
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, Exception):
+        return f"-ERR {reply}\r\n".encode()
+    return f"+{reply}\r\n".encode()
+
+
+def _set(db, args):
+    key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+    expires_at = None
+    for flag, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+        if flag in options:
+            expires_at = time.monotonic() + int(args[2 + options.index(flag) + 1]) * scale
+    exists = _get(db, key) is not None
+    if (b"NX" in options and exists) or (b"XX" in options and not exists):
+        return None
+    _data[(db, key)] = (value, expires_at)
+    return "OK"
+
+
+def _incrbyfloat(db, key, amount):
+    # Like Redis, keeps the key's expiry
+    expires_at = _data[(db, key)][1] if _get(db, key) is not None else None
+    total = float(_get(db, key) or 0) + float(amount)
+    value = repr(total).encode()
+    _data[(db, key)] = (value, expires_at)
+    return value
+
+
+def _pexpire(db, key, milliseconds):
+    value = _get(db, key)
+    if value is None:
+        return 0
+    _data[(db, key)] = (value, time.monotonic() + int(milliseconds) / 1000)
+    return 1
+
+
+def _execute(state, command, args):
+    db = state["db"]
+    if command == b"PING":
+        return "PONG"
+    if command == b"AUTH":
+        return "OK"
+    if command == b"SELECT":
+        state["db"] = int(args[0])
+        return "OK"
+    if command == b"GET":
+        return _get(db, args[0])
+    if command == b"SET":
+        return _set(db, args)
+    if command == b"INCRBYFLOAT":
+        return _incrbyfloat(db, args[0], args[1])
+    if command == b"PEXPIRE":
+        return _pexpire(db, args[0], args[1])
+    if command == b"DEL":
+        return sum(_data.pop((db, key), None) is not None for key in args)
+    if command == b"EXISTS":
+        return sum(_get(db, key) is not None for key in args)
+    if command == b"DBSIZE":
+        return sum(1 for (key_db, key) in list(_data) if key_db == db and _get(db, key) is not None)
+    if command in (b"FLUSHDB", b"FLUSHALL"):
+        for key in [key for key in _data if command == b"FLUSHALL" or key[0] == db]:
+            del _data[key]
+        return "OK"
+    return ValueError(f"unknown command '{command.decode(errors='replace')}'")
+
+
+async def _read_command(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, e.g. from `nc`
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+async def _handle(reader, writer):
+    state = {"db": 0}
+    try:
+        while True:
+            args = await _read_command(reader)
+            if args is None:
+                break
+            if not args:
+                continue
+            writer.write(_encode(_execute(state, args[0].upper(), args[1:])))
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int):
+    server = await asyncio.start_server(_handle, host, port)
+    print(f"Fake Redis listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
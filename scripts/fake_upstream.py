@@ -0,0 +1,121 @@
+"""
+Local stand-in for SoilGrids, OpenWeatherMap and the chatbot service, with
+injectable latency and errors.
+
+Run it next to the API and point the settings at it:
+
+    uvicorn scripts.fake_upstream:app --port 9000
+    SOILGRIDS_BASE_URL=http://127.0.0.1:9000 \\
+    OPENWEATHER_BASE_URL=http://127.0.0.1:9000 \\
+    CHATBOT_SERVICE_URL=http://127.0.0.1:9000/api/ask \\
+    uvicorn app.main:app
+
+Faults are changed at runtime, per upstream or for all of them:
+
+    curl -X POST localhost:9000/_control \\
+         -H 'Content-Type: application/json' \\
+         -d '{"upstream": "openweathermap", "latency": 12, "error_rate": 0.5}'
+"""
+import asyncio
+import json
+import os
+import random
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+UPSTREAMS = ("soilgrids", "openweathermap", "chatbot")
+
+
+class Fault(BaseModel):
+    latency: float = float(os.environ.get("FAKE_LATENCY", 0))
+    error_rate: float = float(os.environ.get("FAKE_ERROR_RATE", 0))
+    status_code: int = 503
+    token_delay: float = float(os.environ.get("FAKE_TOKEN_DELAY", 0.05))  # Between streamed chatbot tokens
+
+
+class FaultUpdate(Fault):
+    upstream: str | None = None  # None applies to every upstream
+
+
+faults = {name: Fault() for name in UPSTREAMS}
+calls = {name: 0 for name in UPSTREAMS}
+
+app = FastAPI(title="Fake upstreams")
+
+
+async def _inject(upstream: str):
+    calls[upstream] += 1
+    fault = faults[upstream]
+    if fault.latency:
+        await asyncio.sleep(fault.latency)
+    if random.random() < fault.error_rate:
+        raise HTTPException(status_code=fault.status_code, detail=f"Injected {upstream} failure")
+
+
+@app.post("/_control")
+def set_fault(update: FaultUpdate):
+    targets = [update.upstream] if update.upstream else UPSTREAMS
+    for name in targets:
+        if name not in faults:
+            raise HTTPException(status_code=404, detail=f"Unknown upstream: {name}")
+        faults[name] = Fault(**update.dict(exclude={"upstream"}))
+    return {"faults": faults, "calls": calls}
+
+
+@app.get("/_control")
+def get_faults():
+    return {"faults": faults, "calls": calls}
+
+
+@app.get("/soilgrids/v2.0/properties/query")
+async def soilgrids_query(lat: float, lon: float):
+    await _inject("soilgrids")
+    # Scaled the way SoilGrids returns them: pH and SOC x10, textures in g/kg
+    values = {"phh2o": 68, "soc": 95, "sand": 420, "silt": 310, "clay": 270}
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "properties": {
+            "layers": [
+                {"name": name, "unit_measure": {}, "depths": [{"label": "0-5cm", "values": {"mean": mean}}]}
+                for name, mean in values.items()
+            ]
+        },
+    }
+
+
+@app.get("/data/3.0/onecall")
+async def onecall(lat: float, lon: float):
+    await _inject("openweathermap")
+    return {
+        "lat": lat,
+        "lon": lon,
+        "daily": [
+            {"temp": {"day": 26.0 + day * 0.3}, "humidity": 68 + day, "rain": 3.5 if day % 2 else 0.0}
+            for day in range(8)
+        ],
+    }
+
+
+class ChatbotRequest(BaseModel):
+    question: str
+    language_code: str = "en-IN"
+    region: str | None = None
+    stream: bool = False
+
+
+@app.post("/api/ask")
+async def ask(query: ChatbotRequest):
+    await _inject("chatbot")
+    answer = f"Fake guidance for: {query.question}"
+    if not query.stream:
+        return {"answer": answer}
+
+    async def tokens():
+        for word in answer.split(" "):
+            await asyncio.sleep(faults["chatbot"].token_delay)
+            yield json.dumps({"token": word + " "}) + "\n"
+
+    return StreamingResponse(tokens(), media_type="application/x-ndjson")